@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""Encode/decode cost of a game_state keyframe for each available JSON codec"""
+import json
+import os
+import sys
+import time
+
+# Add server directory to path
+sys.path.append(os.path.join(os.path.dirname(__file__), "server"))
+
+from codec import CODECS
+from entities import PlayerEntity
+from game_state import GameManager
+from models import GameUpdate, Player
+
+ROUNDS = 200
+
+
+def make_room(count):
+    gm = GameManager()
+    for i in range(count):
+        player = PlayerEntity.from_model(
+            Player(name=f"Player{i}", x=i * 1.5, y=i * 0.5, entity_id=i + 1)
+        )
+        gm.players[player.id] = player
+    return gm, gm.snapshot_players()
+
+
+def per_round_ms(func):
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        func()
+    return (time.perf_counter() - start) / ROUNDS * 1000
+
+
+def main():
+    codecs = []
+    for name, codec_class in CODECS.items():
+        try:
+            codecs.append(codec_class())
+        except ImportError:
+            print(f"{name}: not installed, skipped")
+
+    print("=== game_state keyframe codec benchmark (ms per tick) ===")
+    for count in (10, 100, 500):
+        gm, players = make_room(count)
+        world = gm.world_state()
+        # encode_keyframe already returns the JSON text; the codecs and
+        # pydantic are timed on the same message as a dict
+        snapshot = json.loads(gm.encode_keyframe(1, players, world))
+        update = GameUpdate(**snapshot)
+        pydantic_ms = per_round_ms(update.model_dump_json)
+        print(f"{count} players, pydantic model_dump_json: {pydantic_ms:.3f}")
+        fragments_ms = per_round_ms(lambda: gm.encode_keyframe(1, players, world))
+        print(f"{count} players, encode_keyframe (cached): {fragments_ms:.3f}")
+        for codec in codecs:
+            encoded = codec.encode(snapshot)
+            encode_ms = per_round_ms(lambda: codec.encode(snapshot))
+            decode_ms = per_round_ms(lambda: codec.decode(encoded))
+            print(
+                f"{count} players, {codec.name:>8}: encode {encode_ms:.3f} "
+                f"decode {decode_ms:.3f} ({len(encoded)} bytes)"
+            )
+
+
+if __name__ == "__main__":
+    main()
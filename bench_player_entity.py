@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""Per-tick cost of Pydantic Player models vs slotted PlayerEntity objects"""
+import asyncio
+import os
+import random
+import sys
+import time
+
+# Add server directory to path
+sys.path.append(os.path.join(os.path.dirname(__file__), "server"))
+
+from entities import PlayerEntity
+from game_state import GameManager
+from models import Player
+
+TICKS = 200
+
+
+def make_players(count):
+    # Spread players on a grid so nobody falls off or piles up
+    random.seed(0)
+    return [
+        Player(
+            name=f"Player{i}",
+            x=(i % 25) * 40.0,
+            y=(i // 25) * 40.0,
+            velocity_x=random.choice((-1, 1)) * random.uniform(0.05, 0.1),
+            velocity_y=random.choice((-1, 1)) * random.uniform(0.05, 0.1),
+        )
+        for i in range(count)
+    ]
+
+
+async def measure(players, serialize):
+    gm = GameManager()
+    gm.state.stage_center_x = 500
+    gm.state.stage_center_y = 400
+    gm.state.stage_radius = 2000
+    # Without friction the drifting crowd never comes to rest, so every
+    # player stays awake and is simulated on each tick
+    gm.friction = 1.0
+    gm.players = {p.id: p for p in players}
+    for player in players:
+        gm.wake(player)
+
+    start = time.perf_counter()
+    for _ in range(TICKS):
+        await gm.update_physics(1 / 60)
+    physics = (time.perf_counter() - start) / TICKS
+
+    start = time.perf_counter()
+    for _ in range(TICKS):
+        {pid: serialize(p) for pid, p in gm.players.items()}
+    snapshot = (time.perf_counter() - start) / TICKS
+    return physics, snapshot
+
+
+async def main():
+    print("=== Player entity benchmark (ms per tick) ===")
+    print(
+        f"{'players':>8} {'model phys':>11} {'entity phys':>12} "
+        f"{'model dump':>11} {'entity dump':>12}"
+    )
+    for count in (10, 100, 500):
+        models = make_players(count)
+        entities = [PlayerEntity.from_model(p) for p in models]
+        model_physics, model_dump = await measure(models, Player.model_dump)
+        entity_physics, entity_dump = await measure(entities, PlayerEntity.to_dict)
+        print(
+            f"{count:>8} {model_physics * 1000:>11.3f} {entity_physics * 1000:>12.3f} "
+            f"{model_dump * 1000:>11.3f} {entity_dump * 1000:>12.3f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,69 @@
+"""Decoder for the server's binary game_state frames
+
+Must match server/binary_protocol.py; the layout is described there and in
+docs/protocol.md.
+"""
+import struct
+import time
+from typing import Dict, List, Tuple
+
+from codec import codec
+
+FRAME_SNAPSHOT = 1
+
+HEADER = struct.Struct("<BIH")
+ENTITY = struct.Struct("<HhhhhBBBBHHH")
+
+FLAG_DEAD = 1
+FLAG_RESPAWN_READY = 2
+
+POSITION_SCALE = 8
+VELOCITY_SCALE = 256
+STAMINA_SCALE = 2
+TIME_SCALE = 100
+
+
+def decode_snapshot(frame: bytes) -> Tuple[int, Dict[int, Dict], List[Dict]]:
+    """Return the snapshot tick, dynamic player fields keyed by entity id, and
+    the event messages from the frame's trailer (empty without one)
+    """
+    frame_type, tick, count = HEADER.unpack_from(frame)
+    if frame_type != FRAME_SNAPSHOT:
+        raise ValueError(f"Unknown binary frame type: {frame_type}")
+
+    entities_end = HEADER.size + count * ENTITY.size
+    current_time = time.time()
+    entities = {}
+    for (
+        entity_id,
+        x,
+        y,
+        velocity_x,
+        velocity_y,
+        stamina,
+        flags,
+        collision_time,
+        boost_time,
+        deaths,
+        cooldown,
+        last_input_seq,
+    ) in ENTITY.iter_unpack(frame[HEADER.size : entities_end]):
+        is_dead = bool(flags & FLAG_DEAD)
+        entities[entity_id] = {
+            "x": x / POSITION_SCALE,
+            "y": y / POSITION_SCALE,
+            "velocity_x": velocity_x / VELOCITY_SCALE,
+            "velocity_y": velocity_y / VELOCITY_SCALE,
+            "stamina": stamina / STAMINA_SCALE,
+            "is_dead": is_dead,
+            "respawn_ready": bool(flags & FLAG_RESPAWN_READY),
+            "collision_effect_time": collision_time / TIME_SCALE,
+            "boost_effect_time": boost_time / TIME_SCALE,
+            "deaths": deaths,
+            "last_input_seq": last_input_seq,  # Low 16 bits only
+            "respawn_cooldown": (
+                current_time + cooldown / TIME_SCALE if is_dead else 0.0
+            ),
+        }
+    events = codec.decode(frame[entities_end:]) if len(frame) > entities_end else []
+    return tick, entities, events
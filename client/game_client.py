@@ -1,31 +1,49 @@
 import asyncio
-import json
 import threading
 from typing import Callable, Dict, Optional
 
 import websockets
+from binary_decoder import decode_snapshot
+from codec import codec
+
+# Sent once in the join-time game_state; not carried into later snapshots
+JOIN_ONLY_FIELDS = ("messages", "your_player_id", "protocol", "physics")
 
 
 class GameClient:
-    def __init__(self):
+    def __init__(self, protocol: str = "binary"):
+        self.protocol = protocol  # Requested at join; the server may answer "json"
         self.websocket: Optional[websockets.WebSocketClientProtocol] = None
         self.game_state: Dict = {}
         self.player_id: Optional[str] = None
         self.connected = False
         self.message_handlers: Dict[str, Callable] = {}
         self.receive_task: Optional[asyncio.Task] = None
+        self.input_seq = 0
+
+        # Players by snapshot tick, kept as baselines for delta snapshots
+        self.snapshots: Dict[int, Dict] = {}
+        self.snapshot_history_size = 32
 
     def set_message_handler(self, message_type: str, handler: Callable):
         self.message_handlers[message_type] = handler
 
-    async def connect(self, server_url: str, player_name: str) -> bool:
+    async def connect(
+        self, server_url: str, player_name: str, room_id: Optional[str] = None
+    ) -> bool:
         try:
             self.websocket = await websockets.connect(server_url)
             self.connected = True
 
             # Send join message
-            join_message = {"type": "join", "name": player_name}
-            await self.websocket.send(json.dumps(join_message))
+            join_message = {
+                "type": "join",
+                "name": player_name,
+                "protocol": self.protocol,
+            }
+            if room_id:
+                join_message["room_id"] = room_id
+            await self.websocket.send(codec.encode(join_message))
 
             # Start receiving messages
             self.receive_task = asyncio.create_task(self._receive_messages())
@@ -49,7 +67,25 @@ class GameClient:
         message = {"type": "input", "action": action, "direction": direction}
 
         try:
-            await self.websocket.send(json.dumps(message))
+            await self.websocket.send(codec.encode(message))
+        except Exception as e:
+            print(f"Failed to send input: {e}")
+            self.connected = False
+
+    async def send_input_state(self, seq: int, directions: int, boost: bool):
+        """Send the keys held this frame; the server applies them every tick"""
+        if not self.connected or not self.websocket:
+            return
+
+        message = {
+            "type": "input_state",
+            "seq": seq,
+            "directions": directions,
+            "boost": boost,
+        }
+
+        try:
+            await self.websocket.send(codec.encode(message))
         except Exception as e:
             print(f"Failed to send input: {e}")
             self.connected = False
@@ -58,17 +94,24 @@ class GameClient:
         try:
             while self.connected and self.websocket:
                 message = await self.websocket.recv()
-                data = json.loads(message)
+                if isinstance(message, bytes):
+                    # Events in the trailer happened before the snapshot
+                    tick, entities, events = decode_snapshot(message)
+                    for event in events:
+                        await self._handle_message(event)
+                    self.game_state = self._apply_binary_snapshot(tick, entities)
+                    await self._handle_message(
+                        {"type": "game_state", "data": self.game_state}, decoded=True
+                    )
+                    continue
 
-                message_type = data.get("type")
-
-                if message_type == "game_state":
-                    self.game_state = data.get("data", {})
-                    self.player_id = self.game_state.get("your_player_id")
-
-                # Call registered handler
-                if message_type in self.message_handlers:
-                    self.message_handlers[message_type](data)
+                data = codec.decode(message)
+                if data.get("type") == "batch":
+                    # A tick's events followed by its game_state, in order
+                    for item in data.get("data", []):
+                        await self._handle_message(item)
+                else:
+                    await self._handle_message(data)
 
         except websockets.exceptions.ConnectionClosed:
             self.connected = False
@@ -76,6 +119,101 @@ class GameClient:
             print(f"Error receiving message: {e}")
             self.connected = False
 
+    async def _handle_message(self, data: Dict, decoded: bool = False):
+        """Apply one server message and pass it to its registered handler
+
+        decoded is True for game_state built from a binary frame, which is
+        already a full state rather than a keyframe or delta.
+        """
+        message_type = data.get("type")
+
+        if message_type == "game_state" and not decoded:
+            state = await self._apply_snapshot(data.get("data", {}))
+            if state is None:
+                return
+            if "your_player_id" in state:
+                self.player_id = state["your_player_id"]
+            # Handlers see the join fields once; deltas and binary frames are
+            # merged onto what's left, so they don't replay the backlog
+            self.game_state = {
+                key: value
+                for key, value in state.items()
+                if key not in JOIN_ONLY_FIELDS
+            }
+            data = {"type": "game_state", "data": state}
+        elif message_type == "player_joined":
+            # Binary snapshots only carry entity ids, so track who they are
+            player_data = data.get("data", {}).get("player", {})
+            self.game_state.setdefault("players", {})[
+                player_data.get("id")
+            ] = player_data
+        elif message_type == "player_left":
+            player_id = data.get("data", {}).get("player_id")
+            self.game_state.get("players", {}).pop(player_id, None)
+
+        # Call registered handler
+        if message_type in self.message_handlers:
+            self.message_handlers[message_type](data)
+
+    async def _apply_snapshot(self, snapshot: Dict) -> Optional[Dict]:
+        """Rebuild the full game state from a keyframe or a delta snapshot
+
+        Deltas only carry what changed since a baseline tick we acknowledged,
+        so they are applied on top of that stored baseline and acked in turn.
+        """
+        tick = snapshot.get("tick")
+        if snapshot.get("keyframe") or "baseline" not in snapshot:
+            players = snapshot.get("players", {})
+            state = dict(snapshot)
+        else:
+            base_players = self.snapshots.get(snapshot["baseline"])
+            if base_players is None:
+                # Baseline already discarded: ask for a keyframe instead
+                await self._send({"type": "resync"})
+                return None
+            players = dict(base_players)
+            for player_id, changes in snapshot.get("players", {}).items():
+                players[player_id] = {**players.get(player_id, {}), **changes}
+            for player_id in snapshot.get("removed", []):
+                players.pop(player_id, None)
+            state = {**self.game_state, **snapshot}
+            del state["baseline"], state["removed"]
+
+        if tick is not None:
+            self.snapshots[tick] = players
+            while len(self.snapshots) > self.snapshot_history_size:
+                del self.snapshots[min(self.snapshots)]
+            await self._send({"type": "ack", "tick": tick})
+
+        # Handlers edit the live players dict, so keep the baseline separate
+        state["players"] = dict(players)
+        return state
+
+    def _apply_binary_snapshot(self, tick: int, entities: Dict[int, Dict]) -> Dict:
+        """Merge a binary snapshot's dynamic fields into the known players"""
+        known = self.game_state.get("players", {})
+        by_entity_id = {
+            player_data.get("entity_id"): player_id
+            for player_id, player_data in known.items()
+        }
+
+        # Far players may be left out of a frame (area of interest); they keep
+        # their last known state until a frame carries them again
+        players = dict(known)
+        for entity_id, fields in entities.items():
+            player_id = by_entity_id.get(entity_id)
+            if player_id is not None:
+                players[player_id] = {**known[player_id], **fields}
+
+        return {**self.game_state, "tick": tick, "players": players}
+
+    async def _send(self, message: Dict):
+        try:
+            await self.websocket.send(codec.encode(message))
+        except Exception as e:
+            print(f"Failed to send {message.get('type')}: {e}")
+            self.connected = False
+
 
 class AsyncGameClient:
     def __init__(self):
@@ -92,12 +230,18 @@ class AsyncGameClient:
         asyncio.set_event_loop(self.loop)
         self.loop.run_forever()
 
-    def connect(self, server_url: str, player_name: str, callback: Callable = None):
+    def connect(
+        self,
+        server_url: str,
+        player_name: str,
+        callback: Callable = None,
+        room_id: Optional[str] = None,
+    ):
         if not self.loop:
             return False
 
         future = asyncio.run_coroutine_threadsafe(
-            self.client.connect(server_url, player_name), self.loop
+            self.client.connect(server_url, player_name, room_id), self.loop
         )
 
         try:
@@ -117,6 +261,17 @@ class AsyncGameClient:
                 self.client.send_input(action, direction), self.loop
             )
 
+    def send_input_state(self, directions: int, boost: bool) -> int:
+        """Queue this frame's input state and return its sequence number"""
+        if not (self.loop and self.client.connected):
+            return self.client.input_seq
+        self.client.input_seq += 1
+        seq = self.client.input_seq
+        asyncio.run_coroutine_threadsafe(
+            self.client.send_input_state(seq, directions, boost), self.loop
+        )
+        return seq
+
     def set_message_handler(self, message_type: str, handler: Callable):
         self.client.set_message_handler(message_type, handler)
 
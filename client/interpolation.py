@@ -0,0 +1,103 @@
+import time
+from collections import deque
+from typing import Dict, Optional
+
+# Fields blended between two snapshots; everything else comes from the newer one
+INTERPOLATED_FIELDS = ("x", "y")
+
+
+class SnapshotBuffer:
+    """Timestamped server snapshots for drawing remote players smoothly
+
+    Remote players are drawn `delay` seconds in the past, between the two
+    snapshots around that moment, so bursty delivery or a low server send rate
+    doesn't show up as stutter. When no newer snapshot has arrived yet (packet
+    loss) movement is extrapolated for at most `max_extrapolation` seconds.
+    """
+
+    def __init__(
+        self,
+        delay: float = 0.1,
+        max_extrapolation: float = 0.1,
+        max_snapshots: int = 32,
+    ):
+        self.delay = delay
+        self.max_extrapolation = max_extrapolation
+        self.snapshots = deque(maxlen=max_snapshots)  # (server_time, players)
+        self.simulation_rate: Optional[float] = None
+        # Estimated local clock minus server clock
+        self.clock_offset: Optional[float] = None
+
+    def configure(self, simulation_rate: float):
+        self.simulation_rate = simulation_rate
+
+    def reset(self):
+        self.snapshots.clear()
+        self.clock_offset = None
+
+    def push(self, tick: int, players: Dict, received_at: float = None):
+        """Store a snapshot, timed by its server tick when we know the tick rate"""
+        if received_at is None:
+            received_at = time.monotonic()
+        if not self.simulation_rate:
+            server_time = received_at
+        else:
+            server_time = tick / self.simulation_rate
+
+        if self.snapshots and server_time <= self.snapshots[-1][0]:
+            if server_time < self.snapshots[-1][0] - 1.0:
+                # Tick went backwards by a lot: new session, start over
+                self.reset()
+            else:
+                return  # Late or duplicate
+
+        # The least delayed arrival is closest to the true offset; drift back up
+        # slowly so a one-off early packet doesn't pin the estimate
+        offset = received_at - server_time
+        if self.clock_offset is None or offset < self.clock_offset:
+            self.clock_offset = offset
+        else:
+            self.clock_offset += (offset - self.clock_offset) * 0.01
+
+        self.snapshots.append((server_time, players))
+
+    def sample(self, now: float = None) -> Optional[Dict]:
+        """Players as they should be drawn at `now`, or None with no snapshots"""
+        snapshots = list(self.snapshots)
+        if not snapshots:
+            return None
+        if now is None:
+            now = time.monotonic()
+        render_time = now - self.clock_offset - self.delay
+
+        if render_time <= snapshots[0][0] or len(snapshots) == 1:
+            return snapshots[0][1]
+
+        for (older_time, older), (newer_time, newer) in zip(snapshots, snapshots[1:]):
+            if render_time <= newer_time:
+                alpha = (render_time - older_time) / (newer_time - older_time)
+                return self._blend(older, newer, alpha)
+
+        # Past the newest snapshot: keep moving along the last known motion
+        (older_time, older), (newer_time, newer) = snapshots[-2], snapshots[-1]
+        ahead = min(render_time - newer_time, self.max_extrapolation)
+        return self._blend(older, newer, 1 + ahead / (newer_time - older_time))
+
+    def _blend(self, older: Dict, newer: Dict, alpha: float) -> Dict:
+        players = {}
+        for player_id, player_data in newer.items():
+            previous = older.get(player_id)
+            if (
+                previous is None
+                or previous.get("is_dead")
+                or player_data.get("is_dead")
+            ):
+                # Joined, died or respawned in between: don't slide across
+                players[player_id] = player_data
+                continue
+            blended = dict(player_data)
+            for field in INTERPOLATED_FIELDS:
+                start = previous.get(field, 0.0)
+                blended[field] = start + (player_data.get(field, 0.0) - start) * alpha
+            players[player_id] = blended
+        return players
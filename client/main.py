@@ -1,6 +1,14 @@
 # -*- coding: utf-8 -*-
 import pygame
 from game_client import AsyncGameClient
+from interpolation import SnapshotBuffer
+from prediction import (
+    DIRECTION_DOWN,
+    DIRECTION_LEFT,
+    DIRECTION_RIGHT,
+    DIRECTION_UP,
+    Predictor,
+)
 from renderer import GameRenderer
 from server_manager import ServerManager
 
@@ -12,6 +20,8 @@ class Game:
         self.running = True
         self.connected = False
         self.game_state = {}
+        self.messages = []
+        self.max_messages = 20
 
         # Server management
         self.server_manager = ServerManager()
@@ -33,6 +43,19 @@ class Game:
         # Game input state
         self.keys_pressed = set()
         self.boost_keys = {pygame.K_LSHIFT, pygame.K_RSHIFT}
+        self.direction_keys = {
+            DIRECTION_UP: (pygame.K_w, pygame.K_UP),
+            DIRECTION_DOWN: (pygame.K_s, pygame.K_DOWN),
+            DIRECTION_LEFT: (pygame.K_a, pygame.K_LEFT),
+            DIRECTION_RIGHT: (pygame.K_d, pygame.K_RIGHT),
+        }
+
+        # Client-side prediction for our own player
+        self.predictor = Predictor()
+        self.snapshot_pending = False
+
+        # Remote players are drawn slightly in the past, between two snapshots
+        self.snapshot_buffer = SnapshotBuffer(delay=0.1, max_extrapolation=0.1)
 
         # Setup message handlers
         self.client.set_message_handler("game_state", self._handle_game_state)
@@ -44,7 +67,18 @@ class Game:
         self.client.set_message_handler("message", self._handle_message)
 
     def _handle_game_state(self, data):
-        self.game_state = data.get("data", {})
+        state = data.get("data", {})
+        # Only the join-time state carries messages; later ones come as events
+        for message_data in state.get("messages", []):
+            self._add_message(message_data)
+        if "physics" in state:
+            self.predictor.configure(state["physics"])
+            self.snapshot_buffer.configure(state["physics"]["simulation_rate"])
+        if "tick" in state:
+            self.snapshot_buffer.push(state["tick"], state.get("players", {}))
+        self.game_state = {**state, "messages": self.messages}
+        # Reconciled on the main thread, which owns the predictor
+        self.snapshot_pending = True
 
     def _handle_player_update(self, data):
         player_data = data.get("data", {}).get("player", {})
@@ -79,9 +113,14 @@ class Game:
 
     def _handle_message(self, data):
         message_data = data.get("data", {}).get("message", {})
-        if "messages" not in self.game_state:
-            self.game_state["messages"] = []
-        self.game_state["messages"].append(message_data)
+        self._add_message(message_data)
+
+    def _add_message(self, message_data):
+        message_id = message_data.get("id")
+        if any(message.get("id") == message_id for message in self.messages):
+            return
+        self.messages.append(message_data)
+        del self.messages[: -self.max_messages]
 
     def handle_connection_input(self, event):
         if event.type == pygame.KEYDOWN:
@@ -197,23 +236,53 @@ class Game:
         elif event.type == pygame.KEYUP:
             self.keys_pressed.discard(event.key)
 
-    def process_movement(self):
+    def process_movement(self, frame_dt: float):
         if not self.connected:
             return
 
+        if self.snapshot_pending:
+            self.snapshot_pending = False
+            own_player = self.game_state.get("players", {}).get(
+                self.client.get_player_id()
+            )
+            if own_player:
+                self.predictor.reconcile(own_player)
+
         # Check for boost modifier
         is_boosting = any(key in self.keys_pressed for key in self.boost_keys)
-        action = "boost" if is_boosting else "move"
-
-        # Movement keys (WASD + Arrow keys)
-        if pygame.K_w in self.keys_pressed or pygame.K_UP in self.keys_pressed:
-            self.client.send_input(action, "up")
-        if pygame.K_s in self.keys_pressed or pygame.K_DOWN in self.keys_pressed:
-            self.client.send_input(action, "down")
-        if pygame.K_a in self.keys_pressed or pygame.K_LEFT in self.keys_pressed:
-            self.client.send_input(action, "left")
-        if pygame.K_d in self.keys_pressed or pygame.K_RIGHT in self.keys_pressed:
-            self.client.send_input(action, "right")
+
+        # Movement keys (WASD + Arrow keys) as one bitmask
+        directions = 0
+        for bit, keys in self.direction_keys.items():
+            if any(key in self.keys_pressed for key in keys):
+                directions |= bit
+
+        # One message every frame, even with no keys held: each predicted tick
+        # then carries its own seq, so acks never discard ticks the server
+        # hasn't simulated yet (e.g. coasting after a release)
+        seq = self.client.send_input_state(directions, is_boosting)
+        self.predictor.advance(frame_dt, seq, directions, is_boosting)
+
+    def _display_state(self, player_id):
+        """Game state with our own player predicted and remote ones interpolated"""
+        players = dict(self.game_state.get("players", {}))
+        sampled = self.snapshot_buffer.sample() or {}
+        for pid, player_data in players.items():
+            if pid == player_id:
+                players[pid] = self.predictor.apply(player_data)
+                continue
+            position = sampled.get(pid)
+            if (
+                position
+                and not position.get("is_dead")
+                and not player_data.get("is_dead")
+            ):
+                players[pid] = {
+                    **player_data,
+                    "x": position["x"],
+                    "y": position["y"],
+                }
+        return {**self.game_state, "players": players}
 
     def run(self):
         clock = pygame.time.Clock()
@@ -230,13 +299,15 @@ class Game:
 
             # Process game logic
             if not self.connection_screen:
-                self.process_movement()
+                self.process_movement(clock.get_time() / 1000)
 
                 # Update connection status
                 if not self.client.is_connected():
                     self.connected = False
                     self.connection_screen = True
                     self.error_message = "接続が失われました"
+                    self.predictor.reset()
+                    self.snapshot_buffer.reset()
 
             # Render
             if self.connection_screen:
@@ -257,7 +328,7 @@ class Game:
                 )
             else:
                 player_id = self.client.get_player_id()
-                self.renderer.render_game(self.game_state, player_id)
+                self.renderer.render_game(self._display_state(player_id), player_id)
 
             clock.tick(60)  # 60 FPS
 
@@ -0,0 +1,121 @@
+import math
+from collections import deque
+from typing import Dict, Optional
+
+# Direction bits of input_state messages (must match server/game_state.py)
+DIRECTION_UP = 1
+DIRECTION_DOWN = 2
+DIRECTION_LEFT = 4
+DIRECTION_RIGHT = 8
+
+# Fields of our own player that prediction overrides
+PREDICTED_FIELDS = ("x", "y", "velocity_x", "velocity_y", "stamina")
+
+
+class Predictor:
+    """Client-side prediction and server reconciliation for our own player
+
+    Runs GameManager.apply_movement and the friction/integration part of
+    update_physics locally, using the constants the server sends in the
+    join-time game_state. Inputs the server hasn't acknowledged yet are kept
+    and replayed on top of every authoritative snapshot.
+    """
+
+    def __init__(self, max_pending: int = 120):
+        self.physics: Optional[Dict] = None
+        self.state: Optional[Dict] = None
+        self.pending = deque(maxlen=max_pending)  # (seq, directions, boost)
+        self.accumulator = 0.0
+        self.last_seq = 0
+
+    def configure(self, physics: Dict):
+        self.physics = physics
+
+    def reset(self):
+        self.state = None
+        self.pending.clear()
+        self.accumulator = 0.0
+
+    def advance(self, frame_dt: float, seq: int, directions: int, boost: bool):
+        """Step the local player in server-sized ticks for this frame"""
+        self.last_seq = max(self.last_seq, seq)
+        if self.physics is None or self.state is None:
+            return
+        tick_dt = 1 / self.physics["simulation_rate"]
+        # Cap the backlog so a hitch doesn't fast-forward us off the stage
+        self.accumulator = min(self.accumulator + frame_dt, tick_dt * 5)
+        while self.accumulator >= tick_dt:
+            self.accumulator -= tick_dt
+            self.pending.append((seq, directions, boost))
+            self._step(self.state, directions, boost, tick_dt)
+
+    def reconcile(self, server_player: Dict):
+        """Rewind to the server's state and replay unacknowledged inputs"""
+        if self.physics is None or server_player.get("is_dead"):
+            self.reset()
+            return
+
+        acked = self._unwrap_seq(server_player.get("last_input_seq", 0))
+        while self.pending and self.pending[0][0] <= acked:
+            self.pending.popleft()
+
+        self.state = {
+            field: server_player.get(field, 0.0) for field in PREDICTED_FIELDS
+        }
+        self.state["max_stamina"] = server_player.get("max_stamina", 100.0)
+        tick_dt = 1 / self.physics["simulation_rate"]
+        for _, directions, boost in self.pending:
+            self._step(self.state, directions, boost, tick_dt)
+
+    def apply(self, player_data: Dict) -> Dict:
+        """player_data with our predicted fields in place of the server's"""
+        if self.state is None or player_data.get("is_dead"):
+            return player_data
+        predicted = dict(player_data)
+        for field in PREDICTED_FIELDS:
+            predicted[field] = self.state[field]
+        return predicted
+
+    def _unwrap_seq(self, seq: int) -> int:
+        """Binary snapshots carry only the low 16 bits of the sequence number"""
+        return self.last_seq - ((self.last_seq - seq) & 0xFFFF)
+
+    def _step(self, state: Dict, directions: int, boost: bool, dt: float):
+        physics = self.physics
+        steps = dt * physics["physics_rate"]
+
+        # Same as GameManager.apply_movement
+        if directions:
+            force = physics["base_speed"] * steps
+            if boost and state["stamina"] > 0:
+                force *= physics["boost_multiplier"]
+                state["stamina"] = max(
+                    0, state["stamina"] - physics["stamina_drain_rate"] * dt
+                )
+            if directions & DIRECTION_UP:
+                state["velocity_y"] -= force
+            if directions & DIRECTION_DOWN:
+                state["velocity_y"] += force
+            if directions & DIRECTION_LEFT:
+                state["velocity_x"] -= force
+            if directions & DIRECTION_RIGHT:
+                state["velocity_x"] += force
+
+            speed = math.sqrt(state["velocity_x"] ** 2 + state["velocity_y"] ** 2)
+            max_vel = (
+                physics["max_velocity"] if boost else physics["normal_max_velocity"]
+            )
+            if speed > max_vel:
+                scale = max_vel / speed
+                state["velocity_x"] *= scale
+                state["velocity_y"] *= scale
+
+        # Same as the friction/integration part of GameManager.update_physics
+        friction = physics["friction"] ** steps
+        state["velocity_x"] *= friction
+        state["velocity_y"] *= friction
+        state["x"] += state["velocity_x"] * steps
+        state["y"] += state["velocity_y"] * steps
+        state["stamina"] = min(
+            state["max_stamina"], state["stamina"] + physics["stamina_regen_rate"] * dt
+        )
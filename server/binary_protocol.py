@@ -0,0 +1,82 @@
+"""Binary game_state frames for clients that negotiate "protocol": "binary"
+
+Frame layout (little endian):
+    header  <BIH   frame type, snapshot tick, entity count
+    entity  <HhhhhBBBBHHH  repeated count times:
+        entity_id             per-session numeric id (see PlayerEntity.entity_id)
+        x, y                  1/8 px
+        velocity_x/y          1/256 px per tick
+        stamina               1/2 point
+        flags                 FLAG_* bits
+        collision/boost time  1/100 s
+        deaths
+        respawn cooldown      1/100 s remaining
+        last_input_seq        low 16 bits
+    trailer optional, up to the end of the frame: UTF-8 JSON array of the
+            event messages produced since the previous snapshot
+
+Names, colours and ids only change on join, so they stay in the JSON events.
+"""
+import struct
+from typing import Iterable
+
+from entities import PlayerEntity
+
+FRAME_SNAPSHOT = 1
+
+HEADER = struct.Struct("<BIH")
+ENTITY = struct.Struct("<HhhhhBBBBHHH")
+
+FLAG_DEAD = 1
+FLAG_RESPAWN_READY = 2
+FLAG_COLLISION_EFFECT = 4
+FLAG_BOOST_EFFECT = 8
+
+POSITION_SCALE = 8
+VELOCITY_SCALE = 256
+STAMINA_SCALE = 2
+TIME_SCALE = 100
+
+
+def _clamp(value: float, low: int, high: int) -> int:
+    return max(low, min(high, int(round(value))))
+
+
+def encode_snapshot(
+    tick: int,
+    players: Iterable[PlayerEntity],
+    current_time: float,
+    trailer: bytes = b"",
+) -> bytes:
+    players = list(players)
+    parts = [HEADER.pack(FRAME_SNAPSHOT, tick & 0xFFFFFFFF, len(players))]
+    pack = ENTITY.pack
+    for player in players:
+        flags = 0
+        if player.is_dead:
+            flags |= FLAG_DEAD
+        if player.respawn_ready:
+            flags |= FLAG_RESPAWN_READY
+        if player.collision_effect_time > 0:
+            flags |= FLAG_COLLISION_EFFECT
+        if player.boost_effect_time > 0:
+            flags |= FLAG_BOOST_EFFECT
+        cooldown = max(0.0, player.respawn_cooldown - current_time)
+        parts.append(
+            pack(
+                player.entity_id,
+                _clamp(player.x * POSITION_SCALE, -32768, 32767),
+                _clamp(player.y * POSITION_SCALE, -32768, 32767),
+                _clamp(player.velocity_x * VELOCITY_SCALE, -32768, 32767),
+                _clamp(player.velocity_y * VELOCITY_SCALE, -32768, 32767),
+                _clamp(player.stamina * STAMINA_SCALE, 0, 255),
+                flags,
+                _clamp(player.collision_effect_time * TIME_SCALE, 0, 255),
+                _clamp(player.boost_effect_time * TIME_SCALE, 0, 255),
+                _clamp(player.deaths, 0, 65535),
+                _clamp(cooldown * TIME_SCALE, 0, 65535),
+                player.last_input_seq & 0xFFFF,
+            )
+        )
+    parts.append(trailer)
+    return b"".join(parts)
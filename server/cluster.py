@@ -0,0 +1,311 @@
+"""Routing players to rooms hosted on other server nodes
+
+Any node behind the load balancer can accept a socket. If the player's room
+lives on another node, the socket is relayed there over the MessageBus with
+the same frames the worker pipes use (see workers.py). Room ownership comes
+from the RoomRegistry: an explicit claim if some node already hosts the room,
+otherwise rendezvous hashing over the node list, so every node agrees on the
+owner without asking anyone. Claims and per-node load reports are broadcast
+over the bus, which keeps each node's registry up to date.
+"""
+import asyncio
+import itertools
+import struct
+import zlib
+from abc import ABC, abstractmethod
+from functools import partial
+from typing import Callable, Dict, List, Optional, Tuple
+
+from codec import codec
+from rooms import RoomManager
+from workers import RoomWorker, SocketRelay
+
+LENGTH = struct.Struct("<I")
+
+
+class RoomRegistry:
+    """Which node owns which room, and the latest load report of every node"""
+
+    def __init__(self):
+        self.owners: Dict[str, str] = {}
+        self.loads: Dict[str, Dict] = {}
+
+    def owner(self, room_id: str) -> Optional[str]:
+        return self.owners.get(room_id)
+
+    def claim(self, room_id: str, node_id: str) -> str:
+        """Record node_id as the owner unless another node got there first"""
+        return self.owners.setdefault(room_id, node_id)
+
+    def release(self, room_id: str, node_id: str):
+        if self.owners.get(room_id) == node_id:
+            del self.owners[room_id]
+
+    def report_load(self, node_id: str, load: Dict):
+        self.loads[node_id] = load
+
+
+class MessageBus(ABC):
+    """Delivers (kind, key, payload) frames between nodes"""
+
+    @abstractmethod
+    def subscribe(self, node_id: str, handler: Callable[[str, tuple], None]):
+        """Call handler(sender, message) for every frame sent to node_id"""
+
+    @abstractmethod
+    def send(self, sender: str, target: str, message: tuple):
+        """Queue a frame for target without blocking"""
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+
+class InMemoryBus(MessageBus):
+    """Bus between nodes running in one process, for tests"""
+
+    def __init__(self):
+        self.handlers: Dict[str, Callable] = {}
+
+    def subscribe(self, node_id: str, handler: Callable[[str, tuple], None]):
+        self.handlers[node_id] = handler
+
+    def send(self, sender: str, target: str, message: tuple):
+        handler = self.handlers.get(target)
+        if handler is not None:
+            asyncio.get_running_loop().call_soon(handler, sender, message)
+
+
+def encode_frame(sender: str, message: tuple) -> bytes:
+    """Length-prefixed frame; binary snapshots travel as raw bytes after a header"""
+    kind, key, payload = message
+    if isinstance(payload, bytes):
+        header = codec.encode([sender, kind, key]).encode()
+        body = b"B" + LENGTH.pack(len(header)) + header + payload
+    else:
+        body = b"J" + codec.encode([sender, kind, key, payload]).encode()
+    return LENGTH.pack(len(body)) + body
+
+
+def decode_frame(body: bytes) -> Tuple[str, tuple]:
+    if body[:1] == b"B":
+        (header_size,) = LENGTH.unpack_from(body, 1)
+        header_end = 1 + LENGTH.size + header_size
+        sender, kind, key = codec.decode(body[1 + LENGTH.size : header_end])
+        return sender, (kind, key, body[header_end:])
+    sender, kind, key, payload = codec.decode(body[1:])
+    return sender, (kind, key, payload)
+
+
+class TcpBus(MessageBus):
+    """Bus over TCP between nodes listed in `addresses` (node_id -> host, port)
+
+    One outgoing connection per peer, written by its own task from a bounded
+    queue; frames for a peer that is down are dropped once the queue is full.
+    """
+
+    def __init__(self, addresses: Dict[str, Tuple[str, int]], max_queue: int = 10000):
+        self.addresses = addresses
+        self.max_queue = max_queue
+        self.node_id = None
+        self.handler = None
+        self.server = None
+        self.outboxes: Dict[str, asyncio.Queue] = {}
+        self.writer_tasks: List[asyncio.Task] = []
+        self.peer_writers = set()  # Incoming connections from peers
+
+    def subscribe(self, node_id: str, handler: Callable[[str, tuple], None]):
+        self.node_id = node_id
+        self.handler = handler
+
+    async def start(self):
+        host, port = self.addresses[self.node_id]
+        self.server = await asyncio.start_server(self._read_peer, host, port)
+
+    async def stop(self):
+        for task in self.writer_tasks:
+            task.cancel()
+        for writer in list(self.peer_writers):
+            writer.close()
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    def send(self, sender: str, target: str, message: tuple):
+        outbox = self.outboxes.get(target)
+        if outbox is None:
+            outbox = self.outboxes[target] = asyncio.Queue(self.max_queue)
+            self.writer_tasks.append(
+                asyncio.create_task(self._write_peer(target, outbox))
+            )
+        try:
+            outbox.put_nowait(encode_frame(sender, message))
+        except asyncio.QueueFull:
+            pass
+
+    async def _write_peer(self, target: str, outbox: asyncio.Queue):
+        host, port = self.addresses[target]
+        retry_delay = 0.05
+        while True:
+            try:
+                _, writer = await asyncio.open_connection(host, port)
+            except OSError:
+                # Peer not up yet or restarting: back off up to 2 s
+                await asyncio.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, 2.0)
+                continue
+            retry_delay = 0.05
+            try:
+                while True:
+                    writer.write(await outbox.get())
+                    if outbox.empty():
+                        await writer.drain()
+            except (ConnectionError, OSError):
+                writer.close()
+
+    async def _read_peer(self, reader, writer):
+        self.peer_writers.add(writer)
+        try:
+            while True:
+                (size,) = LENGTH.unpack(await reader.readexactly(LENGTH.size))
+                sender, message = decode_frame(await reader.readexactly(size))
+                try:
+                    self.handler(sender, message)
+                except Exception as e:
+                    # One bad frame must not stop every socket from this peer
+                    print(f"Error handling frame from {sender}: {e}")
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception as e:
+            print(f"Dropping bus connection: {e}")
+        finally:
+            # Closing makes the peer's writer reconnect instead of filling a
+            # socket nobody reads
+            self.peer_writers.discard(writer)
+            writer.close()
+
+
+def parse_nodes(spec: str) -> Dict[str, Tuple[str, int]]:
+    """Parse "a=10.0.0.1:9100,b=10.0.0.2:9100" into {node_id: (host, port)}"""
+    addresses = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        node_id, address = entry.split("=", 1)
+        host, port = address.rsplit(":", 1)
+        addresses[node_id] = (host, int(port))
+    return addresses
+
+
+class ClusterNode(SocketRelay):
+    """One server node: hosts its own rooms and relays sockets for the others'
+
+    Sockets relayed from another node are keyed "<front node>:<n>", so frames
+    for them can be sent straight back to the node holding the socket.
+    """
+
+    def __init__(
+        self,
+        node_id: str,
+        nodes: List[str],
+        bus: MessageBus,
+        registry: RoomRegistry,
+        rooms: RoomManager,
+        load_interval: float = 2.0,
+    ):
+        super().__init__()
+        self.node_id = node_id
+        self.nodes = list(nodes)
+        self.bus = bus
+        self.registry = registry
+        self.rooms = rooms
+        self.rooms.on_room_closed = self.release
+        self.host = RoomWorker(rooms, self.send_batch)
+        self.load_interval = load_interval
+        self.conn_ids = itertools.count(1)
+        self.load_task = None
+
+    @property
+    def peers(self) -> List[str]:
+        return [node for node in self.nodes if node != self.node_id]
+
+    async def start(self):
+        self.bus.subscribe(self.node_id, self.on_message)
+        await self.bus.start()
+        self.monitor_task = asyncio.create_task(self.monitor_connections())
+        self.load_task = asyncio.create_task(self.report_load())
+
+    async def stop(self):
+        for task in (self.monitor_task, self.load_task):
+            if task is not None:
+                task.cancel()
+        await self.bus.stop()
+
+    def owner_of(self, room_id: Optional[str]) -> str:
+        """Node that hosts room_id; matchmaking joins stay on this node"""
+        if not room_id:
+            return self.node_id
+        owner = self.registry.owner(room_id)
+        if owner is None:
+            # Rendezvous hashing: same answer on every node, no coordination
+            owner = max(
+                self.nodes, key=lambda node: zlib.crc32(f"{node}/{room_id}".encode())
+            )
+        return owner
+
+    def claim(self, room_id: str):
+        """Announce a room hosted here, e.g. one opened by matchmaking"""
+        if self.registry.claim(room_id, self.node_id) == self.node_id:
+            self.broadcast(("claim", room_id, self.node_id))
+
+    def release(self, room_id: str):
+        self.registry.release(room_id, self.node_id)
+        self.broadcast(("release", room_id, self.node_id))
+
+    def broadcast(self, message: tuple):
+        for peer in self.peers:
+            self.bus.send(self.node_id, peer, message)
+
+    async def forward(self, websocket, join_message: Dict, owner: str):
+        """Relay an accepted socket to the node that owns its room"""
+        conn_id = f"{self.node_id}:{next(self.conn_ids)}"
+        send = partial(self.bus.send, self.node_id, owner)
+        await self.relay(conn_id, websocket, join_message, send)
+
+    def on_message(self, sender: str, message: tuple):
+        kind, key, payload = message
+        if self.deliver(kind, key, payload):
+            return
+        if kind == "claim":
+            self.registry.claim(key, payload)
+        elif kind == "release":
+            self.registry.release(key, payload)
+        elif kind == "load":
+            self.registry.report_load(key, payload)
+        else:
+            # join / message / leave for a socket relayed to a room hosted here
+            self.host.dispatch(kind, key, payload)
+
+    def send_batch(self, batch: List[tuple]):
+        """Frames for relayed sockets go back to the node holding the socket"""
+        for message in batch:
+            front_node = message[1].split(":", 1)[0]
+            self.bus.send(self.node_id, front_node, message)
+
+    def load(self) -> Dict:
+        stats = self.rooms.stats()
+        return {
+            "rooms": stats["count"],
+            "players": stats["players"],
+            "capacity": stats["capacity"],
+        }
+
+    async def report_load(self):
+        while True:
+            load = self.load()
+            self.registry.report_load(self.node_id, load)
+            self.broadcast(("load", self.node_id, load))
+            await asyncio.sleep(self.load_interval)
+
+    def stats(self) -> Dict:
+        return {"node": self.node_id, "nodes": dict(self.registry.loads)}
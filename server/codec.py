@@ -0,0 +1,69 @@
+import json
+import os
+from typing import Any, Dict, Optional
+
+
+class JsonCodec:
+    """Standard library JSON; always available"""
+
+    name = "json"
+
+    def encode(self, obj: Any) -> str:
+        return json.dumps(obj, separators=(",", ":"))
+
+    def decode(self, data) -> Any:
+        return json.loads(data)
+
+
+class OrjsonCodec:
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+
+        self._dumps = orjson.dumps
+        self._loads = orjson.loads
+
+    def encode(self, obj: Any) -> str:
+        return self._dumps(obj).decode()
+
+    def decode(self, data) -> Any:
+        return self._loads(data)
+
+
+class MsgspecCodec:
+    name = "msgspec"
+
+    def __init__(self):
+        import msgspec
+
+        self._encoder = msgspec.json.Encoder()
+        self._decoder = msgspec.json.Decoder()
+
+    def encode(self, obj: Any) -> str:
+        return self._encoder.encode(obj).decode()
+
+    def decode(self, data) -> Any:
+        return self._decoder.decode(data)
+
+
+CODECS: Dict[str, type] = {
+    "orjson": OrjsonCodec,
+    "msgspec": MsgspecCodec,
+    "json": JsonCodec,
+}
+
+
+def get_codec(name: Optional[str] = None):
+    """The named codec, or the fastest one whose backend is installed"""
+    if name:
+        return CODECS[name]()
+    for codec_class in CODECS.values():
+        try:
+            return codec_class()
+        except ImportError:
+            continue
+    return JsonCodec()
+
+
+codec = get_codec(os.environ.get("JSON_CODEC"))
@@ -0,0 +1,229 @@
+import asyncio
+import time
+from collections import deque
+from typing import Dict, List, Optional, Union
+
+# Placeholder in the outbox for the newest unsent snapshot
+_SNAPSHOT = object()
+
+
+def join_events(events: List[str]) -> Optional[str]:
+    """One JSON array of the events in the given JSON arrays, in order"""
+    if not events:
+        return None
+    if len(events) == 1:
+        return events[0]
+    return "[" + ",".join([array[1:-1] for array in events]) + "]"
+
+
+def attach_events(
+    frame: Union[str, bytes], events_json: Optional[str]
+) -> Union[str, bytes]:
+    """A snapshot frame carrying a JSON array of events
+
+    A JSON snapshot becomes a "batch" message with the events before it; a
+    binary one takes them as its trailer.
+    """
+    if events_json is None:
+        return frame
+    if isinstance(frame, bytes):
+        return frame + events_json.encode()
+    # events_json is a JSON array: splice the snapshot in as its last item
+    return f'{{"type":"batch","data":{events_json[:-1]},{frame}]}}'
+
+
+class ClientConnection:
+    """Outbound side of a client websocket with its own queue and writer task
+
+    Broadcasts only enqueue, so one slow client never holds up the others.
+    Reliable frames are delivered in order; game_state snapshots are
+    coalesced so a client that falls behind only ever gets the newest one.
+    Events riding on snapshots are kept apart from them and all go out, in
+    order, with whichever snapshot is written next.
+    """
+
+    def __init__(
+        self,
+        player_id: str,
+        websocket,
+        max_queue_depth: int = 64,
+        stall_timeout: float = 5.0,
+        binary: bool = False,
+        max_inputs_per_tick: int = 4,
+    ):
+        self.player_id = player_id
+        self.websocket = websocket
+        self.binary = binary  # Snapshots as binary frames instead of JSON
+        self.max_queue_depth = max_queue_depth
+        self.stall_timeout = stall_timeout
+        self.outbox = deque()
+        self.snapshot = None
+        self.snapshot_events: List[str] = []  # JSON arrays, oldest first
+        # A socket relayed to another process coalesces snapshots there
+        # again, so it gets them apart from their events
+        self.relay_snapshots = hasattr(websocket, "send_snapshot")
+        self.ready = asyncio.Event()
+        self.sending_since = None
+        self.closed = False
+
+        # Inbound inputs, drained by the game loop once per tick: discrete
+        # actions in order, plus only the newest held-key state
+        self.inputs = deque()
+        self.input_state = None
+        self.states_this_tick = 0
+        self.max_inputs_per_tick = max_inputs_per_tick
+        self.inputs_dropped = 0
+        self.dropped_this_tick = 0
+        self.flood_strikes = 0
+
+        # Delta snapshot baseline: newest snapshot tick the client acknowledged
+        self.acked_tick = None
+        self.last_keyframe_tick = 0
+        # Per-client snapshot contents by tick when area of interest is on;
+        # entry tuples are shared with the room's snapshot history
+        self.views: Dict[int, Dict[str, tuple]] = {}
+        # Snapshot priority each player has built up for this client
+        self.priorities: Dict[str, float] = {}
+
+        # Counters
+        self.frames_sent = 0
+        self.snapshots_dropped = 0
+
+        self.writer_task = asyncio.create_task(self._writer())
+        self.close_task = None
+
+    @property
+    def frames_in_flight(self) -> int:
+        return len(self.outbox) + (self.sending_since is not None)
+
+    def send(self, message: Union[str, bytes]) -> bool:
+        """Queue a reliable frame; False if the client is too far behind"""
+        if self.closed:
+            return False
+        if len(self.outbox) >= self.max_queue_depth:
+            self.closed = True
+            return False
+        self.outbox.append(message)
+        self.ready.set()
+        return True
+
+    def send_snapshot(
+        self, message: Union[str, bytes], events: Optional[str] = None
+    ) -> bool:
+        """Queue a snapshot, replacing any older one that hasn't gone out yet
+
+        events is a JSON array of event messages to deliver with it. Those
+        are never dropped: they wait with the snapshot and are attached to
+        it when it is written.
+        """
+        if self.closed:
+            return False
+        if events is not None and not self.queue_events(events):
+            return False
+        if self.snapshot is not None:
+            # Re-queue at the back so it still follows every earlier frame
+            self.outbox.remove(_SNAPSHOT)
+            self.snapshots_dropped += 1
+        self.snapshot = message
+        self.outbox.append(_SNAPSHOT)
+        self.ready.set()
+        return True
+
+    def queue_events(self, events: str) -> bool:
+        """Hold a JSON array of events for the next snapshot written"""
+        if self.closed:
+            return False
+        if len(self.snapshot_events) >= self.max_queue_depth:
+            self.closed = True
+            return False
+        self.snapshot_events.append(events)
+        return True
+
+    def queue_input(self, player_input, latest_wins: bool = False) -> bool:
+        """Buffer an input for the next tick; False if over the per-tick limit
+
+        latest_wins marks a held-key state: it replaces the one still queued
+        (counted as dropped) so a release is never lost behind older states.
+        Only sending more of them than the limit counts as flooding.
+        """
+        if latest_wins:
+            if self.input_state is not None:
+                self.inputs_dropped += 1
+            self.input_state = player_input
+            self.states_this_tick += 1
+            if self.states_this_tick > self.max_inputs_per_tick:
+                self.dropped_this_tick += 1
+            return True
+        if len(self.inputs) >= self.max_inputs_per_tick:
+            self.inputs_dropped += 1
+            self.dropped_this_tick += 1
+            return False
+        self.inputs.append(player_input)
+        return True
+
+    def drain_inputs(self) -> list:
+        """Take this tick's inputs and update the flood strike count"""
+        inputs = list(self.inputs)
+        self.inputs.clear()
+        if self.input_state is not None:
+            inputs.append(self.input_state)
+            self.input_state = None
+        self.states_this_tick = 0
+        if self.dropped_this_tick:
+            self.flood_strikes += 1
+        elif self.flood_strikes:
+            self.flood_strikes -= 1
+        self.dropped_this_tick = 0
+        return inputs
+
+    def is_stalled(self, now: float) -> bool:
+        """True if a single send has been blocked for longer than stall_timeout"""
+        return (
+            self.sending_since is not None
+            and now - self.sending_since > self.stall_timeout
+        )
+
+    async def _writer(self):
+        try:
+            while True:
+                while not self.outbox:
+                    self.ready.clear()
+                    await self.ready.wait()
+
+                message = self.outbox.popleft()
+                relayed_snapshot = False
+                if message is _SNAPSHOT:
+                    message, self.snapshot = self.snapshot, None
+                    events_json = join_events(self.snapshot_events)
+                    self.snapshot_events = []
+                    if self.relay_snapshots:
+                        relayed_snapshot = True
+                    else:
+                        message = attach_events(message, events_json)
+
+                self.sending_since = time.monotonic()
+                if relayed_snapshot:
+                    await self.websocket.send_snapshot(message, events_json)
+                elif isinstance(message, bytes):
+                    await self.websocket.send_bytes(message)
+                else:
+                    await self.websocket.send_text(message)
+                self.sending_since = None
+                self.frames_sent += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.closed = True
+
+    def close(self):
+        """Stop writing and close the socket, so its receive loop ends too"""
+        self.closed = True
+        self.writer_task.cancel()
+        if self.close_task is None:
+            self.close_task = asyncio.create_task(self._close_socket())
+
+    async def _close_socket(self):
+        try:
+            await self.websocket.close()
+        except Exception:
+            pass  # Already gone
@@ -0,0 +1,107 @@
+from operator import attrgetter
+from typing import Dict, Tuple
+
+from models import Player
+
+
+class PlayerEntity:
+    """Runtime player state used by the simulation
+
+    Plain slotted attributes keep per-tick writes cheap; the Pydantic Player
+    model is only built at the protocol boundary via from_model/to_model.
+    """
+
+    __slots__ = (
+        "id",
+        "name",
+        "x",
+        "y",
+        "velocity_x",
+        "velocity_y",
+        "color",
+        "deaths",
+        "stamina",
+        "max_stamina",
+        "is_dead",
+        "respawn_cooldown",
+        "respawn_ready",
+        "collision_effect_time",
+        "boost_effect_time",
+        "entity_id",
+        "last_input_seq",
+    )
+
+    def __init__(
+        self,
+        id: str,
+        name: str,
+        x: float,
+        y: float,
+        color: Tuple[int, int, int],
+        velocity_x: float = 0.0,
+        velocity_y: float = 0.0,
+        deaths: int = 0,
+        stamina: float = 100.0,
+        max_stamina: float = 100.0,
+        is_dead: bool = False,
+        respawn_cooldown: float = 0.0,
+        respawn_ready: bool = True,
+        collision_effect_time: float = 0.0,
+        boost_effect_time: float = 0.0,
+        entity_id: int = 0,
+        last_input_seq: int = 0,
+    ):
+        self.id = id
+        self.name = name
+        self.x = x
+        self.y = y
+        self.velocity_x = velocity_x
+        self.velocity_y = velocity_y
+        self.color = color
+        self.deaths = deaths
+        self.stamina = stamina
+        self.max_stamina = max_stamina
+        self.is_dead = is_dead
+        self.respawn_cooldown = respawn_cooldown
+        self.respawn_ready = respawn_ready
+        self.collision_effect_time = collision_effect_time
+        self.boost_effect_time = boost_effect_time
+        self.entity_id = entity_id
+        self.last_input_seq = last_input_seq
+
+    @classmethod
+    def from_model(cls, player: Player) -> "PlayerEntity":
+        return cls(**player.model_dump())
+
+    def to_model(self) -> Player:
+        return Player(**self.to_dict())
+
+    def snapshot_entry(self) -> Tuple:
+        """Field values in PLAYER_FIELDS order, compared between snapshots"""
+        return _read_player_fields(self)
+
+    def to_dict(self) -> Dict:
+        """Same shape as Player.model_dump(), without going through Pydantic"""
+        return {
+            "id": self.id,
+            "name": self.name,
+            "x": self.x,
+            "y": self.y,
+            "velocity_x": self.velocity_x,
+            "velocity_y": self.velocity_y,
+            "color": self.color,
+            "deaths": self.deaths,
+            "stamina": self.stamina,
+            "max_stamina": self.max_stamina,
+            "is_dead": self.is_dead,
+            "respawn_cooldown": self.respawn_cooldown,
+            "respawn_ready": self.respawn_ready,
+            "collision_effect_time": self.collision_effect_time,
+            "boost_effect_time": self.boost_effect_time,
+            "entity_id": self.entity_id,
+            "last_input_seq": self.last_input_seq,
+        }
+
+
+PLAYER_FIELDS = PlayerEntity.__slots__
+_read_player_fields = attrgetter(*PLAYER_FIELDS)
@@ -3,15 +3,74 @@ import asyncio
 import math
 import time
 import uuid
-from typing import Dict
+from collections import deque
+from typing import Deque, Dict, List, Union
 
-from models import GameMessage, GameState, GameUpdate, Player, PlayerInput
+from binary_protocol import ENTITY as BINARY_ENTITY
+from binary_protocol import HEADER as BINARY_HEADER
+from binary_protocol import encode_snapshot
+from codec import codec
+from connection import ClientConnection
+from entities import PLAYER_FIELDS, PlayerEntity
+from models import GameMessage, GameState, GameUpdate, InputState, Player, PlayerInput
+from spatial import SpatialHash
+from tick_scheduler import TickScheduler
+from timers import TimerHeap
+
+# Direction bits of InputState.directions
+DIRECTION_UP = 1
+DIRECTION_DOWN = 2
+DIRECTION_LEFT = 4
+DIRECTION_RIGHT = 8
+DIRECTION_BITS = {
+    "up": DIRECTION_UP,
+    "down": DIRECTION_DOWN,
+    "left": DIRECTION_LEFT,
+    "right": DIRECTION_RIGHT,
+}
+
+# Timer kinds besides the effect fields, which are timed under their own name
+RESPAWN_TIMER = "respawn"
+
+# Below this speed (px per physics step) a player with full stamina stops being
+# simulated until input or a collision wakes it
+SLEEP_SPEED = 0.01
+
+# Snapshot prioritisation under a byte budget
+PRIORITY_DISTANCE = 400.0  # Beyond this, distance adds no priority
+DELTA_OVERHEAD = 96  # Rough size of a JSON delta without its players
+IS_DEAD_INDEX = PLAYER_FIELDS.index("is_dead")
 
 
 class GameManager:
-    def __init__(self):
+    def __init__(
+        self,
+        simulation_rate: float = 60,
+        snapshot_rate: float = 30,
+        max_catchup_steps: int = 5,
+        physics_backend: str = "python",
+        keyframe_interval: float = 2.0,
+        max_inputs_per_tick: int = 4,
+        max_flood_strikes: int = 60,
+        interest_radius: float = 0.0,
+        far_update_interval: int = 4,
+        snapshot_byte_budget: int = 0,
+        idle_step_ticks: int = 6,
+        idle_snapshot_rate: float = 2.0,
+    ):
         self.state = GameState()
-        self.connected_clients: Dict[str, any] = {}
+        self.players: Dict[str, PlayerEntity] = {}
+        self.next_entity_id = 0
+        self.max_inputs_per_tick = max_inputs_per_tick
+        # Ticks of sustained input flooding before a client is disconnected
+        self.max_flood_strikes = max_flood_strikes
+        # Latest held input per player, applied once per simulation tick
+        self.held_inputs: Dict[str, InputState] = {}
+        self.connected_clients: Dict[str, ClientConnection] = {}
+        # Events since the last snapshot; they go out in the same frame
+        self.pending_events: List[Dict] = []
+        # Recent messages only; they reach clients through "message" events
+        self.messages: Deque[Dict] = deque(maxlen=20)
         self.base_speed = 1.5  # Reduced from 3.0
         self.boost_multiplier = 2.0
         self.stamina_drain_rate = (
@@ -22,50 +81,155 @@ class GameManager:
         self.max_velocity = 8.0  # Max velocity when boosting
         self.normal_max_velocity = 3.0  # Max velocity when not boosting
         self.respawn_cooldown_time = 3.0  # 3 seconds cooldown
+        self.physics_rate = 60.0  # Rate the per-tick constants above are tuned for
+
+        self.spatial_hash = SpatialHash(self.state.player_size)
+        # Living players split into simulated and resting ones. Sleeping
+        # players don't move, so they stay in their own hash between ticks
+        self.awake: Dict[str, PlayerEntity] = {}
+        self.sleeping: Dict[str, tuple] = {}  # pid -> (player, x, y) at rest
+        self.sleeping_hash = SpatialHash(self.state.player_size)
+        self.numpy_physics = None
+        if physics_backend == "numpy":
+            # Optional backend: needs numpy installed
+            from physics_numpy import NumpyPhysics
+
+            self.numpy_physics = NumpyPhysics(self)
+        self.scheduler = TickScheduler(simulation_rate, max_catchup_steps)
+        self.simulation_rate = simulation_rate
+        self.snapshot_rate = snapshot_rate
+        self.snapshot_interval = 1 / snapshot_rate
+        self.snapshot_accumulator = 0.0
+        # Ticks are counted at simulation_rate even while idle, so tick numbers
+        # keep mapping to time for clients
+        self.tick = 0
+        self.step_ticks = 1  # Ticks advanced per simulation step
+
+        # Hibernation: with nobody awake the room steps once per
+        # idle_step_ticks ticks and snapshots at idle_snapshot_rate (1 = off)
+        self.idle_step_ticks = idle_step_ticks
+        self.idle_snapshot_rate = idle_snapshot_rate
+        self.idle = False
+        # Simulated seconds; advances by each step's dt, so timers on it stay
+        # right when the tick rate changes
+        self.sim_time = 0.0
+        # Respawn readiness and effect expiry, keyed by (player_id, kind)
+        self.timers = TimerHeap()
+
+        # Recent snapshots by tick, used as baselines for delta snapshots
+        self.snapshot_history: Dict[int, tuple] = {}
+        self.snapshot_history_size = 64
+        # pid -> (snapshot entry, its '"pid":{...}' JSON fragment or None).
+        # The entry tuple is reused while the player is unchanged, and the
+        # fragment is only encoded again after it changed
+        self.entry_cache: Dict[str, tuple] = {}
+        self.keyframe_interval_ticks = int(keyframe_interval * simulation_rate)
+
+        # Area of interest (0 = off): players within interest_radius of a
+        # client's own player go out every snapshot, the rest only every
+        # far_update_interval snapshots
+        self.interest_radius = interest_radius
+        self.far_update_interval = far_update_interval
+        self.interest_hash = SpatialHash(interest_radius) if interest_radius else None
+        self.snapshot_count = 0
+        # Per-client cap on delta/binary snapshot size (0 = off); players are
+        # picked by accumulated priority until it is used up
+        self.snapshot_byte_budget = snapshot_byte_budget
 
         # Game loop will be started when the event loop is running
         self.game_loop_task = None
 
     async def game_loop(self):
         """Main game loop that updates physics and game state"""
-        while True:
-            await self.update_physics()
-            await asyncio.sleep(1 / 60)  # 60 FPS
+        await self.scheduler.run(self.update_physics, self.end_of_tick)
 
-    async def update_physics(self):
-        """Update player physics, collisions, and stamina"""
-        current_time = time.time()
+    def stop_loop(self):
+        """Stop ticking an empty room; the next join starts the loop again
 
-        for player in self.state.players.values():
-            # Handle dead players
-            if player.is_dead:
-                # Update respawn cooldown
-                if player.respawn_cooldown > current_time:
-                    continue
-                else:
-                    if not player.respawn_ready:
-                        print(f"Player {player.name} is now ready to respawn!")
-                    player.respawn_ready = True
-                    continue
+        Only cancels, so it is safe from inside the loop's own task.
+        """
+        if self.game_loop_task is not None:
+            self.game_loop_task.cancel()
+            self.game_loop_task = None
+        self.set_idle(False)
+        self.pending_events.clear()
 
-            # Update effect timers
-            if player.collision_effect_time > 0:
-                player.collision_effect_time = max(0, player.collision_effect_time - 1/60)
-            if player.boost_effect_time > 0:
-                player.boost_effect_time = max(0, player.boost_effect_time - 1/60)
+    def set_idle(self, idle: bool):
+        """Switch between the full and the hibernating tick/snapshot rates"""
+        if idle == self.idle:
+            return
+        self.idle = idle
+        if idle:
+            self.step_ticks = self.idle_step_ticks
+            self.scheduler.set_tick_rate(self.simulation_rate / self.idle_step_ticks)
+            self.snapshot_interval = 1 / self.idle_snapshot_rate
+        else:
+            self.step_ticks = 1
+            self.scheduler.set_tick_rate(self.simulation_rate)
+            self.snapshot_interval = 1 / self.snapshot_rate
+        # Clients send an input_state every frame, so a longer step must
+        # accept proportionally more inputs before it counts as flooding
+        for connection in self.connected_clients.values():
+            connection.max_inputs_per_tick = self.max_inputs_per_tick * self.step_ticks
+
+    def activate(self):
+        """Leave hibernation at once, e.g. when input arrives or someone joins"""
+        if self.idle:
+            self.set_idle(False)
+            self.scheduler.wake()
+
+    async def stop(self):
+        """Cancel the game loop and close every remaining connection"""
+        if self.game_loop_task is not None:
+            self.game_loop_task.cancel()
+            try:
+                await self.game_loop_task
+            except asyncio.CancelledError:
+                pass
+            self.game_loop_task = None
+        for connection in self.connected_clients.values():
+            connection.close()
 
+    async def end_of_tick(self, elapsed: float):
+        """Output stages that run once after each batch of simulation steps"""
+        await self.snapshot_stage(elapsed)
+        await self.remove_dead_clients()
+        # Hibernate while nothing moves (everyone asleep or dead)
+        self.set_idle(self.idle_step_ticks > 1 and not self.awake)
+
+    async def update_physics(self, dt: float):
+        """Advance player physics, collisions, and stamina by dt seconds"""
+        self.tick += self.step_ticks
+        self.sim_time += dt
+        self.fire_timers()
+        await self.drain_inputs()
+        self.apply_held_inputs(dt)
+
+        if self.numpy_physics is not None:
+            players = list(self.players.values())
+            for player in self.numpy_physics.step(players, dt):
+                await self.kill_player(player)
+            return
+
+        steps = dt * self.physics_rate
+        friction = self.friction**steps
+        sleep_speed_sq = SLEEP_SPEED * SLEEP_SPEED
+        resting = []
+
+        # Dead and sleeping players aren't in self.awake
+        for player in list(self.awake.values()):
             # Apply friction
-            player.velocity_x *= self.friction
-            player.velocity_y *= self.friction
+            player.velocity_x *= friction
+            player.velocity_y *= friction
 
             # Update position based on velocity
-            player.x += player.velocity_x
-            player.y += player.velocity_y
+            player.x += player.velocity_x * steps
+            player.y += player.velocity_y * steps
 
             # Regenerate stamina
             if player.stamina < player.max_stamina:
                 player.stamina = min(
-                    player.max_stamina, player.stamina + self.stamina_regen_rate / 60
+                    player.max_stamina, player.stamina + self.stamina_regen_rate * dt
                 )
 
             # Check circular stage bounds
@@ -73,81 +237,213 @@ class GameManager:
                 await self.kill_player(player)
                 continue
 
+            if (
+                player.velocity_x * player.velocity_x
+                + player.velocity_y * player.velocity_y
+                < sleep_speed_sq
+                and player.stamina >= player.max_stamina
+            ):
+                resting.append(player)
+
         # Handle player collisions
         await self.handle_player_collisions()
 
-        # Broadcast updates if there are changes
-        if self.state.players:
+        # Contact pushes players, so only those still at rest go to sleep
+        for player in resting:
+            if (
+                player.velocity_x * player.velocity_x
+                + player.velocity_y * player.velocity_y
+                < sleep_speed_sq
+            ):
+                self.sleep(player)
+
+    async def snapshot_stage(self, elapsed: float):
+        """Send game_state snapshots at snapshot_rate, independent of physics"""
+        self.snapshot_accumulator += elapsed
+        if self.snapshot_accumulator < self.snapshot_interval:
+            # A hibernating room still sends events without waiting
+            if not (self.idle and self.pending_events):
+                return
+        # Send at most one snapshot per wake-up, however far behind we are
+        self.snapshot_accumulator = min(
+            self.snapshot_accumulator - self.snapshot_interval,
+            self.snapshot_interval,
+        )
+
+        if self.players:
             await self.broadcast_all_players_update()
+        else:
+            # Nobody left to tell
+            self.pending_events.clear()
 
     async def handle_player_collisions(self):
         """Handle collisions between players and push them apart"""
-        players = list(self.state.players.values())
-        for i in range(len(players)):
-            for j in range(i + 1, len(players)):
-                player1, player2 = players[i], players[j]
-
-                # Calculate distance between players
-                dx = player2.x - player1.x
-                dy = player2.y - player1.y
-                distance = math.sqrt(dx * dx + dy * dy)
-
-                # Check if collision occurs
-                min_distance = self.state.player_size
-                if distance < min_distance and distance > 0:
-                    # Calculate push direction (normalize)
-                    push_x = dx / distance
-                    push_y = dy / distance
-
-                    # Calculate how much to push apart
-                    overlap = min_distance - distance
-                    push_strength = overlap * 0.5
-
-                    # Push players apart
-                    player1.x -= push_x * push_strength
-                    player1.y -= push_y * push_strength
-                    player2.x += push_x * push_strength
-                    player2.y += push_y * push_strength
-
-                    # Add some velocity for more dynamic collision
-                    push_velocity = 2.0
-                    player1.velocity_x -= push_x * push_velocity
-                    player1.velocity_y -= push_y * push_velocity
-                    player2.velocity_x += push_x * push_velocity
-                    player2.velocity_y += push_y * push_velocity
-
-                    # Add collision effect
-                    player1.collision_effect_time = 0.3  # 0.3 seconds
-                    player2.collision_effect_time = 0.3
-
-    async def add_player(self, websocket, player_name: str) -> Player:
+        # Broad phase: only players in neighbouring grid cells can touch
+        awake = list(self.awake.values())
+        self.spatial_hash.rebuild((player, player.x, player.y) for player in awake)
+        pairs = list(self.spatial_hash.candidate_pairs())
+
+        min_distance = self.state.player_size
+        min_distance_sq = min_distance * min_distance
+        # Sleeping players haven't moved, so only awake ones can newly touch them
+        if self.sleeping:
+            query = self.sleeping_hash.query
+            for player in awake:
+                for other in query(player.x, player.y, min_distance):
+                    pairs.append((player, other))
+
+        for player1, player2 in pairs:
+            # Calculate distance between players
+            dx = player2.x - player1.x
+            dy = player2.y - player1.y
+            distance_sq = dx * dx + dy * dy
+
+            # Check if collision occurs
+            if distance_sq >= min_distance_sq or distance_sq == 0:
+                continue
+            distance = math.sqrt(distance_sq)
+
+            # Contact wakes a sleeping player up
+            if player2.id in self.sleeping:
+                self.wake(player2)
+
+            # Calculate push direction (normalize)
+            push_x = dx / distance
+            push_y = dy / distance
+
+            # Calculate how much to push apart
+            overlap = min_distance - distance
+            push_strength = overlap * 0.5
+
+            # Push players apart
+            player1.x -= push_x * push_strength
+            player1.y -= push_y * push_strength
+            player2.x += push_x * push_strength
+            player2.y += push_y * push_strength
+
+            # Add some velocity for more dynamic collision
+            push_velocity = 2.0
+            player1.velocity_x -= push_x * push_velocity
+            player1.velocity_y -= push_y * push_velocity
+            player2.velocity_x += push_x * push_velocity
+            player2.velocity_y += push_y * push_velocity
+
+            # Add collision effect
+            self.start_effect(player1, "collision_effect_time", 0.3)
+            self.start_effect(player2, "collision_effect_time", 0.3)
+
+    def sleep(self, player: PlayerEntity):
+        """Stop simulating a resting player until wake() is called"""
+        player.velocity_x = 0.0
+        player.velocity_y = 0.0
+        del self.awake[player.id]
+        self.sleeping[player.id] = (player, player.x, player.y)
+        self.sleeping_hash.insert(player, player.x, player.y)
+
+    def wake(self, player: PlayerEntity):
+        """Simulate a living player again (input, contact, join or respawn)"""
+        self.stop_simulating(player.id)
+        if not player.is_dead:
+            self.awake[player.id] = player
+
+    def stop_simulating(self, player_id: str):
+        """Drop a dead or departed player from the awake and sleeping sets"""
+        self.awake.pop(player_id, None)
+        rest = self.sleeping.pop(player_id, None)
+        if rest is not None:
+            self.sleeping_hash.remove(*rest)
+
+    def start_effect(self, player: PlayerEntity, field: str, duration: float):
+        """Set an effect time field and schedule it back to 0 after duration"""
+        setattr(player, field, duration)
+        self.timers.schedule((player.id, field), self.sim_time + duration)
+
+    def fire_timers(self):
+        """Apply every timer that came due by the current simulation time"""
+        for player_id, kind in self.timers.pop_due(self.sim_time):
+            player = self.players.get(player_id)
+            if player is None:
+                continue
+            if kind == RESPAWN_TIMER:
+                if player.is_dead and not player.respawn_ready:
+                    print(f"Player {player.name} is now ready to respawn!")
+                    player.respawn_ready = True
+            else:
+                setattr(player, kind, 0.0)
+
+    def sync_effect_times(self):
+        """Write the remaining time of running effects into their fields
+
+        Effect fields are only set at start and cleared when their timer fires;
+        snapshots show the countdown in between.
+        """
+        sim_time = self.sim_time
+        for (player_id, kind), at in self.timers.due.items():
+            if kind == RESPAWN_TIMER:
+                continue
+            player = self.players.get(player_id)
+            if player is not None:
+                setattr(player, kind, at - sim_time)
+
+    async def add_player(
+        self, websocket, player_name: str, binary: bool = False
+    ) -> PlayerEntity:
         # Start game loop if not already running
         if self.game_loop_task is None:
             self.game_loop_task = asyncio.create_task(self.game_loop())
+        self.activate()
 
-        player = Player(
-            name=player_name, x=self.state.stage_center_x, y=self.state.stage_center_y
+        player = PlayerEntity.from_model(
+            Player(
+                name=player_name,
+                x=self.state.stage_center_x,
+                y=self.state.stage_center_y,
+                entity_id=self.allocate_entity_id(),
+            )
         )
 
-        self.state.players[player.id] = player
-        self.connected_clients[player.id] = websocket
+        self.players[player.id] = player
+        self.wake(player)
+        self.connected_clients[player.id] = ClientConnection(
+            player.id,
+            websocket,
+            binary=binary,
+            max_inputs_per_tick=self.max_inputs_per_tick,
+        )
 
         # Add join message
         await self.add_message(f"{player_name} がゲームに参加しました！")
 
         # Notify all clients about new player
-        update = GameUpdate(type="player_joined", data={"player": player.model_dump()})
+        update = GameUpdate(type="player_joined", data={"player": player.to_dict()})
         await self.broadcast_update(update)
 
         return player
 
+    def allocate_entity_id(self) -> int:
+        """Next free 16-bit entity id for the binary protocol"""
+        in_use = {player.entity_id for player in self.players.values()}
+        while True:
+            self.next_entity_id = self.next_entity_id % 65535 + 1
+            if self.next_entity_id not in in_use:
+                return self.next_entity_id
+
     async def remove_player(self, player_id: str):
+        if player_id not in self.players and player_id not in self.connected_clients:
+            # Already removed, e.g. dropped by the server before its socket
+            # reported the disconnect
+            return
         player_name = None
-        if player_id in self.state.players:
-            player_name = self.state.players[player_id].name
-            del self.state.players[player_id]
+        if player_id in self.players:
+            player_name = self.players[player_id].name
+            del self.players[player_id]
+        self.stop_simulating(player_id)
+        self.entry_cache.pop(player_id, None)
+        for kind in (RESPAWN_TIMER, "collision_effect_time", "boost_effect_time"):
+            self.timers.cancel((player_id, kind))
         if player_id in self.connected_clients:
-            del self.connected_clients[player_id]
+            self.connected_clients.pop(player_id).close()
+        self.held_inputs.pop(player_id, None)
 
         if player_name:
             await self.add_message(f"{player_name} がゲームから退出しました")
@@ -155,21 +451,34 @@ class GameManager:
         update = GameUpdate(type="player_left", data={"player_id": player_id})
         await self.broadcast_update(update)
 
+        if not self.players:
+            # Nobody left: no reason to keep ticking
+            self.stop_loop()
+
     async def add_message(self, text: str):
         """Add a game message to be displayed to players"""
         message = GameMessage(id=str(uuid.uuid4()), text=text, timestamp=time.time())
-        self.state.messages.append(message.model_dump())
+        self.expire_messages(message.timestamp)
+        self.messages.append(message.model_dump())
 
         # Broadcast message
         update = GameUpdate(type="message", data={"message": message.model_dump()})
         await self.broadcast_update(update)
 
+    def expire_messages(self, now: float) -> List[Dict]:
+        """Drop messages past their duration and return the ones still shown"""
+        while self.messages and (
+            self.messages[0]["timestamp"] + self.messages[0]["duration"] < now
+        ):
+            self.messages.popleft()
+        return list(self.messages)
+
     async def handle_player_input(self, player_input: PlayerInput):
         player_id = player_input.player_id
-        if player_id not in self.state.players:
+        if player_id not in self.players:
             return
 
-        player = self.state.players[player_id]
+        player = self.players[player_id]
 
         # Handle respawn input
         if player.is_dead and player_input.action == "respawn":
@@ -187,30 +496,102 @@ class GameManager:
         if player.is_dead:
             return
 
-        if player_input.direction:
-            await self.apply_movement(
-                player, player_input.direction, player_input.action == "boost"
+        if player_input.direction in DIRECTION_BITS:
+            self.apply_movement(
+                player,
+                DIRECTION_BITS[player_input.direction],
+                player_input.action == "boost",
+                1 / self.physics_rate,
+            )
+
+    def handle_client_message(self, player_id: str, message: Dict):
+        """Dispatch one decoded message from a joined client"""
+        message_type = message.get("type")
+        if message_type == "input_state":
+            input_state = InputState(
+                player_id=player_id,
+                seq=message.get("seq", 0),
+                directions=message.get("directions", 0),
+                boost=message.get("boost", False),
+            )
+            self.queue_input(player_id, input_state)
+        elif message_type == "input":
+            player_input = PlayerInput(
+                player_id=player_id,
+                action=message.get("action"),
+                direction=message.get("direction"),
             )
+            self.queue_input(player_id, player_input)
+        elif message_type == "ack":
+            self.acknowledge_snapshot(player_id, message.get("tick"))
+        elif message_type == "resync":
+            self.request_resync(player_id)
+
+    def queue_input(self, player_id: str, player_input: Union[InputState, PlayerInput]):
+        """Buffer an input until the next tick, within the per-tick limit"""
+        connection = self.connected_clients.get(player_id)
+        if connection is not None:
+            connection.queue_input(player_input, isinstance(player_input, InputState))
+            # Idle clients keep sending empty input states; those don't need
+            # the room at full rate
+            if not isinstance(player_input, InputState) or player_input.directions:
+                self.activate()
+
+    async def drain_inputs(self):
+        """Apply each client's queued inputs once per tick"""
+        for player_id, connection in list(self.connected_clients.items()):
+            for player_input in connection.drain_inputs():
+                if isinstance(player_input, InputState):
+                    self.handle_input_state(player_input)
+                else:
+                    await self.handle_player_input(player_input)
+
+            if connection.flood_strikes >= self.max_flood_strikes:
+                print(f"Disconnecting {player_id}: too many inputs per tick")
+                connection.closed = True  # Removed at the end of the tick
 
-    async def apply_movement(self, player: Player, direction: str, is_boosting: bool):
-        """Apply movement force to player with inertia"""
+    def handle_input_state(self, input_state: InputState):
+        """Buffer a client's held keys; they are applied on every tick"""
+        player = self.players.get(input_state.player_id)
+        if player is None:
+            return
+        held = self.held_inputs.get(input_state.player_id)
+        if held is not None and input_state.seq <= held.seq:
+            return  # Stale or duplicate
+        self.held_inputs[input_state.player_id] = input_state
+        # Lets the client drop acknowledged inputs from its prediction buffer
+        player.last_input_seq = input_state.seq
+
+    def apply_held_inputs(self, dt: float):
+        for player_id, input_state in self.held_inputs.items():
+            player = self.players.get(player_id)
+            if player is None or player.is_dead or not input_state.directions:
+                continue
+            self.apply_movement(player, input_state.directions, input_state.boost, dt)
+
+    def apply_movement(
+        self, player: PlayerEntity, directions: int, is_boosting: bool, dt: float
+    ):
+        """Apply movement force for dt seconds to player with inertia"""
+        if player.id not in self.awake:
+            self.wake(player)
         # Calculate movement force
-        force = self.base_speed
+        force = self.base_speed * dt * self.physics_rate
         if is_boosting and player.stamina > 0:
             force *= self.boost_multiplier
             # Drain stamina
-            player.stamina = max(0, player.stamina - self.stamina_drain_rate / 60)
+            player.stamina = max(0, player.stamina - self.stamina_drain_rate * dt)
             # Add boost effect
-            player.boost_effect_time = 0.1  # Short boost effect
+            self.start_effect(player, "boost_effect_time", 0.1)
 
         # Apply force based on direction
-        if direction == "up":
+        if directions & DIRECTION_UP:
             player.velocity_y -= force
-        elif direction == "down":
+        if directions & DIRECTION_DOWN:
             player.velocity_y += force
-        elif direction == "left":
+        if directions & DIRECTION_LEFT:
             player.velocity_x -= force
-        elif direction == "right":
+        if directions & DIRECTION_RIGHT:
             player.velocity_x += force
 
         # Limit maximum velocity based on boost status
@@ -221,7 +602,7 @@ class GameManager:
             player.velocity_x *= scale
             player.velocity_y *= scale
 
-    def is_outside_stage(self, player: Player) -> bool:
+    def is_outside_stage(self, player: PlayerEntity) -> bool:
         """Check if player is outside the circular stage"""
         center_x = self.state.stage_center_x
         center_y = self.state.stage_center_y
@@ -233,11 +614,16 @@ class GameManager:
 
         return distance > self.state.stage_radius
 
-    async def kill_player(self, player: Player):
+    async def kill_player(self, player: PlayerEntity):
         """Kill player and start respawn cooldown"""
+        self.stop_simulating(player.id)
         player.is_dead = True
         player.respawn_ready = False
+        # Wall-clock end for clients to count down; readiness is a timer
         player.respawn_cooldown = time.time() + self.respawn_cooldown_time
+        self.timers.schedule(
+            (player.id, RESPAWN_TIMER), self.sim_time + self.respawn_cooldown_time
+        )
         player.deaths += 1
         player.velocity_x = 0.0
         player.velocity_y = 0.0
@@ -245,10 +631,10 @@ class GameManager:
         # Add defeat message
         await self.add_message(f"{player.name} がステージから落ちました！")
 
-        update = GameUpdate(type="player_death", data={"player": player.model_dump()})
+        update = GameUpdate(type="player_death", data={"player": player.to_dict()})
         await self.broadcast_update(update)
 
-    async def respawn_player(self, player: Player):
+    async def respawn_player(self, player: PlayerEntity):
         """Respawn player at stage center and reset physics"""
         player.x = self.state.stage_center_x - self.state.player_size / 2
         player.y = self.state.stage_center_y - self.state.player_size / 2
@@ -258,64 +644,440 @@ class GameManager:
         player.respawn_ready = False
         player.respawn_cooldown = 0.0
         player.stamina = player.max_stamina
+        self.wake(player)
 
         # Add respawn message
         await self.add_message(f"{player.name} が復活しました！")
 
-        update = GameUpdate(type="respawn", data={"player": player.model_dump()})
+        update = GameUpdate(type="respawn", data={"player": player.to_dict()})
         await self.broadcast_update(update)
 
-    async def broadcast_player_update(self, player: Player):
-        update = GameUpdate(type="player_update", data={"player": player.model_dump()})
+    async def broadcast_player_update(self, player: PlayerEntity):
+        update = GameUpdate(type="player_update", data={"player": player.to_dict()})
         await self.broadcast_update(update)
 
+    def physics_constants(self) -> Dict:
+        """Movement model parameters, so clients can predict their own player"""
+        return {
+            "base_speed": self.base_speed,
+            "boost_multiplier": self.boost_multiplier,
+            "stamina_drain_rate": self.stamina_drain_rate,
+            "stamina_regen_rate": self.stamina_regen_rate,
+            "friction": self.friction,
+            "max_velocity": self.max_velocity,
+            "normal_max_velocity": self.normal_max_velocity,
+            "physics_rate": self.physics_rate,
+            "simulation_rate": self.simulation_rate,
+        }
+
+    def world_state(self) -> Dict:
+        """Non-player game_state fields"""
+        return {
+            "field_width": self.state.field_width,
+            "field_height": self.state.field_height,
+            "player_size": self.state.player_size,
+            "stage_center_x": self.state.stage_center_x,
+            "stage_center_y": self.state.stage_center_y,
+            "stage_radius": self.state.stage_radius,
+        }
+
     async def broadcast_all_players_update(self):
-        """Broadcast all players state (for physics updates)"""
-        players_data = {pid: p.model_dump() for pid, p in self.state.players.items()}
-        update = GameUpdate(
-            type="game_state",
-            data={
-                "players": players_data,
-                "field_width": self.state.field_width,
-                "field_height": self.state.field_height,
-                "player_size": self.state.player_size,
-                "stage_center_x": self.state.stage_center_x,
-                "stage_center_y": self.state.stage_center_y,
-                "stage_radius": self.state.stage_radius,
-                "messages": self.state.messages,
-            },
+        """Send each client a delta against its acknowledged snapshot
+
+        Clients without a usable baseline, or due a periodic keyframe, get the
+        full state instead. Frames are encoded once per distinct baseline, or
+        per client when area of interest or the byte budget gives every client
+        its own view. Pending events are queued alongside the snapshot and
+        attached to whichever snapshot the connection writes next: a "batch"
+        message for JSON clients, the trailer of a binary frame.
+        """
+        tick = self.tick
+        self.sync_effect_times()
+        events_json = None
+        if self.pending_events:
+            events_json = codec.encode(self.pending_events)
+            self.pending_events = []
+        players = self.snapshot_players()
+        world = self.world_state()
+        self.snapshot_history[tick] = (players, world)
+        while len(self.snapshot_history) > self.snapshot_history_size:
+            del self.snapshot_history[next(iter(self.snapshot_history))]
+
+        self.snapshot_count += 1
+        budgeted = bool(self.snapshot_byte_budget)
+        per_client = bool(self.interest_radius) or budgeted
+        use_interest = bool(self.interest_radius) and (
+            self.snapshot_count % self.far_update_interval != 0
         )
-        await self.broadcast_update(update)
+        if use_interest:
+            self.interest_hash.rebuild(
+                (pid, player.x, player.y) for pid, player in self.players.items()
+            )
+        base = None
+        if budgeted:
+            base = self.base_priorities()
+            # Events go out with the snapshot and take from the same budget
+            events_size = len(events_json) if events_json is not None else 0
+            keyframe_overhead = len(self.encode_keyframe(tick, {}, world))
+
+        encoded: Dict[int, str] = {}
+        binary_frame = None
+        current_time = time.time()
+        for connection in self.connected_clients.values():
+            # Players whose current state this client gets; None means all
+            fresh = None
+            if use_interest:
+                fresh = self.nearby_players(connection.player_id)
+
+            if connection.binary:
+                # Binary frames always carry full state, but only for the
+                # players the client is interested in or has budget for
+                if budgeted:
+                    fresh = self.select_by_priority(
+                        connection,
+                        players,
+                        base,
+                        BINARY_HEADER.size + events_size,
+                        fresh,
+                    )
+                if fresh is not None:
+                    frame = encode_snapshot(
+                        tick, (self.players[pid] for pid in fresh), current_time
+                    )
+                elif binary_frame is None:
+                    frame = binary_frame = encode_snapshot(
+                        tick, self.players.values(), current_time
+                    )
+                else:
+                    frame = binary_frame
+                connection.send_snapshot(frame, events_json)
+                continue
+
+            views = connection.views
+            baseline = connection.acked_tick
+            # Under a budget a keyframe would hold only the players picked for
+            # it, so it is only sent when the client has no usable baseline
+            if (
+                baseline not in self.snapshot_history
+                or (per_client and baseline not in views)
+                or not budgeted
+                and tick - connection.last_keyframe_tick >= self.keyframe_interval_ticks
+            ):
+                baseline = None
+                connection.last_keyframe_tick = tick
+
+            if not per_client:
+                message = encoded.get(baseline)
+                if message is None:
+                    if baseline is None:
+                        message = self.encode_keyframe(tick, players, world)
+                    else:
+                        data = self.encode_delta(tick, baseline, players, world)
+                        message = codec.encode({"type": "game_state", "data": data})
+                    encoded[baseline] = message
+                connection.send_snapshot(message, events_json)
+                continue
+
+            known = self.known_view(connection, baseline)
+            if budgeted:
+                if baseline is None:
+                    # A keyframe replaces what the client has, so it starts
+                    # from nothing and fills in as players get picked
+                    known = {}
+                    overhead = keyframe_overhead + events_size
+                else:
+                    overhead = DELTA_OVERHEAD + events_size
+                fresh = self.select_by_priority(
+                    connection, players, base, overhead, fresh, known
+                )
+            view = players
+            if fresh is not None:
+                # Everything the client already has, updated with fresh players
+                view = {**known, **{pid: players[pid] for pid in fresh}}
+                if not budgeted:
+                    # Players the client hasn't seen yet go out in full;
+                    # under a budget they wait until they are picked
+                    new = players.keys() - view.keys()
+                    view.update((pid, players[pid]) for pid in new)
+                    fresh = fresh | new
+                for pid in view.keys() - players.keys():
+                    del view[pid]
+            views[tick] = view
+            while len(views) > self.snapshot_history_size:
+                del views[next(iter(views))]
+            if baseline is None:
+                message = self.encode_keyframe(tick, view, world)
+            else:
+                data = self.encode_delta(tick, baseline, view, world, known, fresh)
+                message = codec.encode({"type": "game_state", "data": data})
+            connection.send_snapshot(message, events_json)
+
+    def snapshot_players(self) -> Dict[str, tuple]:
+        """Snapshot entries of every player, pid -> PLAYER_FIELDS values
+
+        A player whose fields all match the previous snapshot keeps the same
+        tuple object, so the cached JSON fragment stays valid and comparisons
+        against it short-cut on identity. Only changed players are marked
+        dirty (their fragment dropped) and re-encoded when next needed.
+        """
+        cache = self.entry_cache
+        players = {}
+        for pid, player in self.players.items():
+            entry = player.snapshot_entry()
+            cached = cache.get(pid)
+            if cached is not None and cached[0] == entry:
+                entry = cached[0]
+            else:
+                cache[pid] = (entry, None)
+            players[pid] = entry
+        return players
+
+    def player_fragment(self, pid: str, entry: tuple) -> str:
+        """'"pid":{fields}' JSON for a snapshot entry, encoded once per change"""
+        cached = self.entry_cache.get(pid)
+        if cached is not None and cached[0] is entry:
+            if cached[1] is None:
+                fragment = codec.encode({pid: dict(zip(PLAYER_FIELDS, entry))})[1:-1]
+                self.entry_cache[pid] = (entry, fragment)
+                return fragment
+            return cached[1]
+        # An older entry a client still has in its view
+        return codec.encode({pid: dict(zip(PLAYER_FIELDS, entry))})[1:-1]
+
+    def nearby_players(self, player_id: str) -> set:
+        """Ids of players within interest_radius of player_id, itself included"""
+        player = self.players.get(player_id)
+        if player is None:
+            return set(self.players)
+        radius_sq = self.interest_radius * self.interest_radius
+        nearby = {player_id}
+        for pid in self.interest_hash.query(player.x, player.y, self.interest_radius):
+            other = self.players[pid]
+            dx = other.x - player.x
+            dy = other.y - player.y
+            if dx * dx + dy * dy <= radius_sq:
+                nearby.add(pid)
+        return nearby
+
+    def known_view(self, connection: ClientConnection, baseline) -> Dict:
+        """What the client already believes: its baseline view, else the last sent
+
+        Players left out of a snapshot keep these entries, so a delta carries
+        nothing for them.
+        """
+        views = connection.views
+        if baseline is not None:
+            return views[baseline]
+        if views:
+            return views[next(reversed(views))]
+        return {}
+
+    def base_priorities(self) -> Dict[str, tuple]:
+        """Per-snapshot (priority, x, y, is_dead) shared by every client
+
+        The client-independent part of the priority a player earns: moving
+        fast and colliding make a player more urgent to send.
+        """
+        normal_max_velocity = self.normal_max_velocity
+        base = {}
+        for pid, player in self.players.items():
+            speed = math.hypot(player.velocity_x, player.velocity_y)
+            priority = 1.0 + speed / normal_max_velocity
+            if player.collision_effect_time > 0:
+                priority += 2.0
+            base[pid] = (priority, player.x, player.y, player.is_dead)
+        return base
+
+    def select_by_priority(
+        self,
+        connection: ClientConnection,
+        players: Dict,
+        base: Dict[str, tuple],
+        overhead: int,
+        candidates=None,
+        known: Dict = None,
+    ) -> set:
+        """Players that fit this client's byte budget, highest priority first
+
+        Every player accumulates priority each snapshot until it is sent: the
+        shared base, up to +4 for being near the client's own player, and +5
+        for dying or respawning since the client's baseline. overhead is the
+        size of the frame without its players, events included. Candidates
+        limits who may be sent now (area of interest); `known` is the client's
+        baseline view for delta sizes, None for binary frames.
+        """
+        own = self.players.get(connection.player_id)
+        own_x, own_y = (own.x, own.y) if own is not None else (math.inf, math.inf)
+        previous = connection.priorities.get
+        known_get = known.get if known is not None else None
+        closeness_scale = 4.0 / PRIORITY_DISTANCE
+        sqrt = math.sqrt
+        accumulated = {}
+        for pid, (priority, x, y, is_dead) in base.items():
+            dx = x - own_x
+            dy = y - own_y
+            closeness = 4.0 - sqrt(dx * dx + dy * dy) * closeness_scale
+            if closeness > 0:
+                priority += closeness
+            if known_get is not None:
+                known_entry = known_get(pid)
+                if known_entry is None or known_entry[IS_DEAD_INDEX] != is_dead:
+                    priority += 5.0
+            accumulated[pid] = previous(pid, 0.0) + priority
+        # Rebuilt every snapshot, so players who left drop out
+        connection.priorities = accumulated
+
+        budget = self.snapshot_byte_budget - overhead
+        selected = set()
+        ranked = sorted(players, key=accumulated.__getitem__, reverse=True)
+        if own is not None and own.id in players:
+            # Prediction reconciles against our own player: always send it
+            ranked.remove(own.id)
+            ranked.insert(0, own.id)
+        for pid in ranked:
+            if candidates is not None and pid not in candidates:
+                continue
+            if known is None:
+                cost = BINARY_ENTITY.size
+            else:
+                cost = self.delta_cost(pid, players[pid], known.get(pid))
+            if cost > budget and pid != connection.player_id:
+                # Skipped players keep their priority; smaller deltas further
+                # down may still fill the rest of the budget
+                continue
+            budget -= cost
+            selected.add(pid)
+            accumulated[pid] = 0.0
+        return selected
+
+    def delta_cost(self, pid: str, entry: tuple, known_entry) -> int:
+        """Approximate bytes this player adds to a JSON delta"""
+        if known_entry is entry or known_entry == entry:
+            return 0
+        if known_entry is None:
+            return len(self.player_fragment(pid, entry)) + 1
+        fields = {
+            field: value
+            for field, value, old_value in zip(PLAYER_FIELDS, entry, known_entry)
+            if value != old_value
+        }
+        return len(pid) + 4 + len(codec.encode(fields))
+
+    def encode_keyframe(self, tick: int, players: Dict, world: Dict) -> str:
+        """Full game_state message, joined from the players' cached fragments"""
+        fragment = self.player_fragment
+        players_json = ",".join(
+            [fragment(pid, entry) for pid, entry in players.items()]
+        )
+        world_json = codec.encode(world)[1:-1]
+        return (
+            f'{{"type":"game_state","data":{{"tick":{tick},"keyframe":true,'
+            f'"players":{{{players_json}}},{world_json}}}}}'
+        )
+
+    def encode_delta(
+        self,
+        tick: int,
+        baseline: int,
+        players: Dict,
+        world: Dict,
+        base_players: Dict = None,
+        candidates=None,
+    ) -> Dict:
+        """Only the fields that changed since the baseline snapshot
+
+        candidates, when given, are the only players that may differ from
+        base_players; the rest are known to match and aren't compared.
+        """
+        room_players, base_world = self.snapshot_history[baseline]
+        if base_players is None:
+            base_players = room_players
+        if candidates is None:
+            candidates = players
+        changed_players = {}
+        for pid in candidates:
+            entry = players[pid]
+            old = base_players.get(pid)
+            if old is entry:
+                continue
+            if old is None:
+                changed_players[pid] = dict(zip(PLAYER_FIELDS, entry))
+            elif old != entry:
+                changed_players[pid] = {
+                    field: value
+                    for field, value, old_value in zip(PLAYER_FIELDS, entry, old)
+                    if value != old_value
+                }
+
+        data = {
+            "tick": tick,
+            "baseline": baseline,
+            "players": changed_players,
+            "removed": list(base_players.keys() - players.keys()),
+        }
+        for key, value in world.items():
+            if base_world.get(key) != value:
+                data[key] = value
+        return data
 
     async def broadcast_update(self, update: GameUpdate):
+        """Queue an event for every client; it goes out with the next snapshot"""
         if self.connected_clients:
-            message = update.model_dump_json()
-            dead_connections = []
+            self.pending_events.append({"type": update.type, "data": update.data})
+
+    def is_binary(self, player_id: str) -> bool:
+        connection = self.connected_clients.get(player_id)
+        return connection is not None and connection.binary
+
+    def acknowledge_snapshot(self, player_id: str, tick: int):
+        """Record the newest snapshot a client has applied, for delta baselines"""
+        connection = self.connected_clients.get(player_id)
+        if connection is None or tick not in self.snapshot_history:
+            return
+        if connection.acked_tick is None or tick > connection.acked_tick:
+            connection.acked_tick = tick
+
+    def request_resync(self, player_id: str):
+        """Send the client a full keyframe with its next snapshot"""
+        connection = self.connected_clients.get(player_id)
+        if connection is not None:
+            connection.acked_tick = None
+
+    def send_to_player(self, player_id: str, message: str):
+        connection = self.connected_clients.get(player_id)
+        if connection is not None:
+            connection.send(message)
 
-            for player_id, websocket in self.connected_clients.items():
-                try:
-                    await websocket.send_text(message)
-                except Exception:
-                    dead_connections.append(player_id)
+    async def remove_dead_clients(self):
+        """Drop clients whose writer failed, overflowed or is stuck sending
 
-            # Clean up dead connections
-            for player_id in dead_connections:
-                await self.remove_player(player_id)
+        Runs at the end of a tick rather than from inside broadcast_update, so
+        the leave broadcasts don't re-enter a fan-out that is in progress.
+        """
+        now = time.monotonic()
+        dead_connections = [
+            player_id
+            for player_id, connection in self.connected_clients.items()
+            if connection.closed or connection.is_stalled(now)
+        ]
+        for player_id in dead_connections:
+            await self.remove_player(player_id)
 
     async def get_game_state_for_player(self, player_id: str) -> Dict:
         return {
             "type": "game_state",
             "data": {
-                "players": {
-                    pid: p.model_dump() for pid, p in self.state.players.items()
-                },
+                "players": {pid: p.to_dict() for pid, p in self.players.items()},
                 "field_width": self.state.field_width,
                 "field_height": self.state.field_height,
                 "player_size": self.state.player_size,
                 "stage_center_x": self.state.stage_center_x,
                 "stage_center_y": self.state.stage_center_y,
                 "stage_radius": self.state.stage_radius,
-                "messages": self.state.messages,
+                # Short backlog so new joiners see what is still on screen
+                "messages": self.expire_messages(time.time()),
                 "your_player_id": player_id,
+                "protocol": "binary" if self.is_binary(player_id) else "json",
+                "physics": self.physics_constants(),
             },
         }
@@ -1,11 +1,30 @@
-import json
+import os
+from contextlib import asynccontextmanager
+from functools import partial
 
+from cluster import ClusterNode, RoomRegistry, TcpBus, parse_nodes
+from codec import codec
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from game_state import GameManager
-from models import PlayerInput
+from rooms import RoomFullError, RoomManager
+from workers import WorkerPool
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if worker_pool:
+        worker_pool.start()
+    if cluster_node:
+        await cluster_node.start()
+    yield
+    if worker_pool:
+        worker_pool.stop()
+    if cluster_node:
+        await cluster_node.stop()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -15,7 +34,42 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-game_manager = GameManager()
+
+GAME_OPTIONS = {
+    "simulation_rate": float(os.environ.get("SIMULATION_RATE", 60)),
+    "snapshot_rate": float(os.environ.get("SNAPSHOT_RATE", 30)),
+    "max_catchup_steps": int(os.environ.get("MAX_CATCHUP_STEPS", 5)),
+    "physics_backend": os.environ.get("PHYSICS_BACKEND", "python"),
+    "interest_radius": float(os.environ.get("INTEREST_RADIUS", 0)),
+    "snapshot_byte_budget": int(os.environ.get("SNAPSHOT_BYTE_BUDGET", 0)),
+    "idle_step_ticks": int(os.environ.get("IDLE_STEP_TICKS", 6)),
+}
+ROOM_OPTIONS = {
+    "room_capacity": int(os.environ.get("ROOM_CAPACITY", 8)),
+    "idle_timeout": float(os.environ.get("ROOM_IDLE_TIMEOUT", 30)),
+}
+
+# WORKERS > 0 runs rooms in that many worker processes; this process then
+# only handles the sockets
+WORKERS = int(os.environ.get("WORKERS", 0))
+
+room_manager = RoomManager(partial(GameManager, **GAME_OPTIONS), **ROOM_OPTIONS)
+worker_pool = WorkerPool(WORKERS, GAME_OPTIONS, ROOM_OPTIONS) if WORKERS else None
+
+# CLUSTER_NODES="a=10.0.0.1:9100,b=10.0.0.2:9100" with NODE_ID=a lets any node
+# accept a socket and relay it to the node that owns the room
+CLUSTER_NODES = parse_nodes(os.environ.get("CLUSTER_NODES", ""))
+cluster_node = None
+if CLUSTER_NODES:
+    if worker_pool:
+        raise ValueError("CLUSTER_NODES and WORKERS can't be combined")
+    cluster_node = ClusterNode(
+        os.environ["NODE_ID"],
+        list(CLUSTER_NODES),
+        TcpBus(CLUSTER_NODES),
+        RoomRegistry(),
+        room_manager,
+    )
 
 
 @app.get("/")
@@ -25,41 +79,51 @@ async def root():
 
 @app.get("/health")
 async def health():
-    return {"status": "healthy", "players": len(game_manager.state.players)}
+    if worker_pool:
+        return {"status": "healthy", "workers": await worker_pool.stats()}
+    health = {
+        "status": "healthy",
+        "rooms": room_manager.stats(),
+    }
+    if cluster_node:
+        health["cluster"] = cluster_node.stats()
+    return health
 
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
+    if worker_pool:
+        await worker_pool.serve(websocket)
+        return
+
     player = None
+    game_manager = None
 
     try:
         # Wait for player name
         data = await websocket.receive_text()
-        message = json.loads(data)
+        message = codec.decode(data)
 
         if message.get("type") == "join":
-            player_name = message.get("name", "Anonymous")
-            player = await game_manager.add_player(websocket, player_name)
-
-            # Send initial game state to the new player
-            initial_state = await game_manager.get_game_state_for_player(player.id)
-            await websocket.send_text(json.dumps(initial_state))
-
-            print(f"Player {player_name} ({player.id}) joined the game")
+            if cluster_node:
+                owner = cluster_node.owner_of(message.get("room_id"))
+                if owner != cluster_node.node_id:
+                    await cluster_node.forward(websocket, message, owner)
+                    return
+            try:
+                room_id, game_manager, player = await room_manager.join(
+                    websocket, message
+                )
+            except RoomFullError:
+                return
+            if cluster_node:
+                cluster_node.claim(room_id)
 
         # Handle player inputs
         while True:
             data = await websocket.receive_text()
-            message = json.loads(data)
-
-            if message.get("type") == "input":
-                player_input = PlayerInput(
-                    player_id=player.id,
-                    action=message.get("action"),
-                    direction=message.get("direction"),
-                )
-                await game_manager.handle_player_input(player_input)
+            game_manager.handle_client_message(player.id, codec.decode(data))
 
     except WebSocketDisconnect:
         if player:
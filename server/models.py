@@ -21,6 +21,8 @@ class Player(BaseModel):
     respawn_ready: bool = True
     collision_effect_time: float = 0.0
     boost_effect_time: float = 0.0
+    entity_id: int = 0  # Compact per-session id used by the binary protocol
+    last_input_seq: int = 0  # Newest input_state seq the server has taken
 
     def __init__(self, **data):
         if "id" not in data:
@@ -35,14 +37,12 @@ class Player(BaseModel):
 
 
 class GameState(BaseModel):
-    players: Dict[str, Player] = {}
     field_width: int = 800
     field_height: int = 600
     player_size: int = 30
     stage_center_x: int = 400
     stage_center_y: int = 300
     stage_radius: int = 250
-    messages: list = []
 
 
 class PlayerInput(BaseModel):
@@ -51,6 +51,13 @@ class PlayerInput(BaseModel):
     direction: str = None  # "up", "down", "left", "right"
 
 
+class InputState(BaseModel):
+    player_id: str
+    seq: int  # Increases with every input_state the client sends
+    directions: int = 0  # Bitmask of DIRECTION_* bits in game_state.py
+    boost: bool = False
+
+
 class GameUpdate(BaseModel):
     type: str  # "player_update", "player_joined", "player_left", "respawn", "player_death", "message"
     data: Dict
@@ -0,0 +1,195 @@
+from operator import attrgetter
+from typing import List
+
+import numpy as np
+from entities import PlayerEntity
+from game_state import SLEEP_SPEED
+
+# Player fields mirrored into the arrays, one contiguous row per field
+FIELDS = (
+    "x",
+    "y",
+    "velocity_x",
+    "velocity_y",
+    "stamina",
+    "max_stamina",
+)
+X, Y, VX, VY, STAMINA, MAX_STAMINA = range(len(FIELDS))
+_read_fields = attrgetter(*FIELDS)
+_read_is_dead = attrgetter("is_dead")
+
+# The cell itself plus the forward half of its 3x3 neighbourhood
+_NEIGHBOUR_OFFSETS = ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1))
+
+
+class NumpyPhysics:
+    """Struct-of-arrays physics backend that runs each pass vectorized
+
+    Entity state is copied into preallocated arrays at the start of a step and
+    written back once at the end, so GameManager keeps working with
+    PlayerEntity objects everywhere else.
+    """
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.capacity = 0
+        self.columns = np.empty((len(FIELDS), 0))
+        self.alive = np.empty(0, dtype=bool)
+
+    def _reserve(self, count: int):
+        if count <= self.capacity:
+            return
+        self.capacity = max(count, self.capacity * 2, 64)
+        self.columns = np.empty((len(FIELDS), self.capacity))
+        self.alive = np.empty(self.capacity, dtype=bool)
+
+    def step(self, players: List[PlayerEntity], dt: float) -> List[PlayerEntity]:
+        """Advance players by dt and return the ones that left the stage"""
+        count = len(players)
+        if not count:
+            return []
+        self._reserve(count)
+
+        columns = self.columns[:, :count]
+        columns[...] = np.array(list(map(_read_fields, players)), dtype=float).T
+        alive = self.alive[:count]
+        alive[...] = np.fromiter(map(_read_is_dead, players), bool, count)
+        np.logical_not(alive, out=alive)
+
+        x, y = columns[X], columns[Y]
+        vx, vy = columns[VX], columns[VY]
+        manager = self.manager
+
+        # Friction, integration and stamina regen; respawn readiness and effect
+        # expiry are GameManager timers
+        steps = dt * manager.physics_rate
+        friction = manager.friction**steps
+        vx *= friction
+        vy *= friction
+        x += vx * steps
+        y += vy * steps
+        np.minimum(
+            columns[MAX_STAMINA],
+            columns[STAMINA] + manager.stamina_regen_rate * dt,
+            out=columns[STAMINA],
+        )
+
+        # Circular stage bounds
+        state = manager.state
+        half_size = state.player_size / 2
+        dx = x + half_size - state.stage_center_x
+        dy = y + half_size - state.stage_center_y
+        outside = alive & (dx * dx + dy * dy > state.stage_radius**2)
+
+        collided = self._resolve_collisions(columns, np.flatnonzero(alive & ~outside))
+
+        # Rest detection, as in the Python path: slow, full stamina and not
+        # pushed this step. Resting players are stopped so they stay put
+        resting = (
+            alive
+            & ~outside
+            & (vx * vx + vy * vy < SLEEP_SPEED * SLEEP_SPEED)
+            & (columns[STAMINA] >= columns[MAX_STAMINA])
+        )
+        resting[collided] = False
+        vx[resting] = 0.0
+        vy[resting] = 0.0
+
+        # Write the living players back; dead ones were not simulated.
+        # Everyone is still stepped here, but the awake and sleeping sets are
+        # kept up to date so the room can hibernate once nothing moves
+        awake, sleeping = manager.awake, manager.sleeping
+        for index in np.flatnonzero(alive):
+            player = players[index]
+            (
+                player.x,
+                player.y,
+                player.velocity_x,
+                player.velocity_y,
+                player.stamina,
+                _,
+            ) = columns[:, index].tolist()
+            if resting[index]:
+                if player.id in awake:
+                    manager.sleep(player)
+            elif player.id in sleeping and not outside[index]:
+                manager.wake(player)
+        for index in collided:
+            manager.start_effect(players[index], "collision_effect_time", 0.3)
+
+        return [players[index] for index in np.flatnonzero(outside)]
+
+    def _collision_pairs(self, px: np.ndarray, py: np.ndarray, size: float):
+        """Find index pairs sharing or neighbouring a player_size grid cell"""
+        cell_x = np.floor(px / size).astype(np.int64)
+        cell_y = np.floor(py / size).astype(np.int64)
+        # Shift so neighbour offsets stay non-negative and pack into one key
+        cell_x -= cell_x.min() - 1
+        cell_y -= cell_y.min() - 1
+        width = int(cell_y.max()) + 2
+        keys = cell_x * width + cell_y
+
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        firsts, seconds = [], []
+        for offset_x, offset_y in _NEIGHBOUR_OFFSETS:
+            target = keys + offset_x * width + offset_y
+            start = np.searchsorted(sorted_keys, target, "left")
+            counts = np.searchsorted(sorted_keys, target, "right") - start
+            total = int(counts.sum())
+            if not total:
+                continue
+            first = np.repeat(np.arange(len(keys)), counts)
+            run_starts = np.repeat(np.cumsum(counts) - counts, counts)
+            run_offsets = np.arange(total) - run_starts
+            second = order[np.repeat(start, counts) + run_offsets]
+            if offset_x == 0 and offset_y == 0:
+                keep = second > first
+                first, second = first[keep], second[keep]
+            firsts.append(first)
+            seconds.append(second)
+
+        if not firsts:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+        return np.concatenate(firsts), np.concatenate(seconds)
+
+    def _resolve_collisions(self, columns: np.ndarray, indices: np.ndarray):
+        """Push overlapping players apart, resolving all contacts at once
+
+        Returns the indices of the players that touched someone.
+        """
+        if len(indices) < 2:
+            return []
+        size = self.manager.state.player_size
+        px, py = columns[X, indices], columns[Y, indices]
+        first, second = self._collision_pairs(px, py, size)
+
+        dx = px[second] - px[first]
+        dy = py[second] - py[first]
+        distance_sq = dx * dx + dy * dy
+        hit = (distance_sq < size * size) & (distance_sq > 0)
+        if not hit.any():
+            return []
+        first, second = first[hit], second[hit]
+        distance = np.sqrt(distance_sq[hit])
+        push_x = dx[hit] / distance
+        push_y = dy[hit] / distance
+
+        # Push players apart
+        push_strength = (size - distance) * 0.5
+        for column, push in ((X, push_x), (Y, push_y)):
+            values = columns[column, indices]
+            np.subtract.at(values, first, push * push_strength)
+            np.add.at(values, second, push * push_strength)
+            columns[column, indices] = values
+
+        # Add some velocity for more dynamic collision
+        push_velocity = 2.0
+        for column, push in ((VX, push_x), (VY, push_y)):
+            values = columns[column, indices]
+            np.subtract.at(values, first, push * push_velocity)
+            np.add.at(values, second, push * push_velocity)
+            columns[column, indices] = values
+
+        return np.unique(indices[np.concatenate((first, second))]).tolist()
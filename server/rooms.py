@@ -0,0 +1,154 @@
+import asyncio
+import time
+import uuid
+from typing import Callable, Dict, Optional, Tuple
+
+from codec import codec
+from entities import PlayerEntity
+from game_state import GameManager
+
+
+class RoomFullError(Exception):
+    """The requested room has no free slot"""
+
+
+class RoomManager:
+    """Hosts many independent GameManager rooms in one process
+
+    Each room runs its own tick task (started by its first join). Players
+    either join a room by id, or are matched into the fullest room that still
+    has space so matches fill up before new ones are opened. Rooms that stay
+    empty for idle_timeout seconds are stopped and dropped.
+    """
+
+    def __init__(
+        self,
+        manager_factory: Callable[[], GameManager] = GameManager,
+        room_capacity: int = 8,
+        idle_timeout: float = 30.0,
+    ):
+        self.manager_factory = manager_factory
+        self.room_capacity = room_capacity
+        self.idle_timeout = idle_timeout
+        self.rooms: Dict[str, GameManager] = {}
+        # Monotonic time each room became empty
+        self.empty_since: Dict[str, float] = {}
+        self.reaper_task = None
+        # Called with the room id after an idle room is torn down
+        self.on_room_closed: Optional[Callable[[str], None]] = None
+
+    def has_space(self, room: GameManager) -> bool:
+        return len(room.players) < self.room_capacity
+
+    def find_room(self, room_id: Optional[str] = None) -> Tuple[str, GameManager]:
+        """The room to join: the named one, or the fullest one with space"""
+        if room_id:
+            room = self.rooms.get(room_id)
+            if room is None:
+                return room_id, self.create_room(room_id)
+            if not self.has_space(room):
+                raise RoomFullError(room_id)
+            return room_id, room
+
+        open_rooms = [
+            (len(room.players), rid, room)
+            for rid, room in self.rooms.items()
+            if self.has_space(room)
+        ]
+        if open_rooms:
+            _, rid, room = max(open_rooms, key=lambda entry: entry[0])
+            return rid, room
+        rid = uuid.uuid4().hex[:8]
+        return rid, self.create_room(rid)
+
+    def create_room(self, room_id: str) -> GameManager:
+        room = self.manager_factory()
+        self.rooms[room_id] = room
+        print(f"Room {room_id} created")
+        return room
+
+    async def add_player(
+        self,
+        websocket,
+        player_name: str,
+        binary: bool = False,
+        room_id: Optional[str] = None,
+    ) -> Tuple[str, GameManager, PlayerEntity]:
+        # Start the idle room reaper with the first join
+        if self.reaper_task is None:
+            self.reaper_task = asyncio.create_task(self.reap_idle_rooms())
+
+        # No await between picking the room and add_player inserting the
+        # player, so two joins can't both take the last slot
+        room_id, room = self.find_room(room_id)
+        self.empty_since.pop(room_id, None)
+        player = await room.add_player(websocket, player_name, binary)
+        return room_id, room, player
+
+    async def join(
+        self, websocket, message: Dict
+    ) -> Tuple[str, GameManager, PlayerEntity]:
+        """Handle a join message: place the player and send the initial state
+
+        A full room is reported to the client and the socket closed before
+        RoomFullError is re-raised.
+        """
+        player_name = message.get("name", "Anonymous")
+        # Binary snapshots if the client asks for them, JSON otherwise
+        binary = message.get("protocol") == "binary"
+        try:
+            room_id, room, player = await self.add_player(
+                websocket, player_name, binary, message.get("room_id")
+            )
+        except RoomFullError:
+            error = {"type": "error", "data": {"message": "ルームが満員です"}}
+            await websocket.send_text(codec.encode(error))
+            await websocket.close()
+            raise
+
+        # Send initial game state to the new player
+        initial_state = await room.get_game_state_for_player(player.id)
+        initial_state["data"]["room_id"] = room_id
+        room.send_to_player(player.id, codec.encode(initial_state))
+
+        print(f"Player {player_name} ({player.id}) joined room {room_id}")
+        return room_id, room, player
+
+    async def reap_idle_rooms(self):
+        """Stop rooms that have had no players for idle_timeout seconds"""
+        while True:
+            await asyncio.sleep(min(self.idle_timeout, 5.0))
+            await self.close_idle_rooms(time.monotonic())
+
+    async def close_idle_rooms(self, now: float):
+        for room_id, room in list(self.rooms.items()):
+            if room.players:
+                self.empty_since.pop(room_id, None)
+                continue
+            empty_since = self.empty_since.setdefault(room_id, now)
+            if now - empty_since >= self.idle_timeout:
+                await self.close_room(room_id)
+
+    async def close_room(self, room_id: str):
+        room = self.rooms.pop(room_id, None)
+        self.empty_since.pop(room_id, None)
+        if room is not None:
+            await room.stop()
+            print(f"Room {room_id} closed")
+            if self.on_room_closed is not None:
+                self.on_room_closed(room_id)
+
+    def stats(self) -> Dict:
+        return {
+            "count": len(self.rooms),
+            "capacity": self.room_capacity,
+            "players": sum(len(room.players) for room in self.rooms.values()),
+            "rooms": {
+                room_id: {
+                    "players": len(room.players),
+                    "idle": room.idle,
+                    "tick": room.scheduler.stats(),
+                }
+                for room_id, room in self.rooms.items()
+            },
+        }
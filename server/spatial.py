@@ -0,0 +1,72 @@
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+# Half of the 3x3 neighbourhood, so each pair of adjacent cells is visited once
+_FORWARD_NEIGHBOURS = ((1, -1), (1, 0), (1, 1), (0, 1))
+
+
+class SpatialHash:
+    """Uniform grid over 2D points for broad-phase neighbour queries"""
+
+    def __init__(self, cell_size: float):
+        self.cell_size = cell_size
+        self.cells: Dict[Tuple[int, int], List[Any]] = {}
+
+    def cell_of(self, x: float, y: float) -> Tuple[int, int]:
+        return int(x // self.cell_size), int(y // self.cell_size)
+
+    def clear(self):
+        self.cells.clear()
+
+    def insert(self, item: Any, x: float, y: float):
+        cell = self.cell_of(x, y)
+        bucket = self.cells.get(cell)
+        if bucket is None:
+            self.cells[cell] = [item]
+        else:
+            bucket.append(item)
+
+    def remove(self, item: Any, x: float, y: float):
+        """Remove an item inserted at (x, y)"""
+        cell = self.cell_of(x, y)
+        bucket = self.cells[cell]
+        bucket.remove(item)
+        if not bucket:
+            del self.cells[cell]
+
+    def rebuild(self, entries: Iterable[Tuple[Any, float, float]]):
+        """Replace the contents with (item, x, y) entries"""
+        self.cells.clear()
+        for item, x, y in entries:
+            self.insert(item, x, y)
+
+    def query(self, x: float, y: float, radius: float) -> Iterator[Any]:
+        """Yield items in the cells overlapping the square around (x, y)
+
+        A superset of the items within radius; callers check exact distance.
+        """
+        cells = self.cells
+        min_cx, min_cy = self.cell_of(x - radius, y - radius)
+        max_cx, max_cy = self.cell_of(x + radius, y + radius)
+        for cx in range(min_cx, max_cx + 1):
+            for cy in range(min_cy, max_cy + 1):
+                bucket = cells.get((cx, cy))
+                if bucket:
+                    yield from bucket
+
+    def candidate_pairs(self) -> Iterator[Tuple[Any, Any]]:
+        """Yield every pair of items in the same or adjacent cells exactly once
+
+        Pairs closer than cell_size are guaranteed to be among the candidates.
+        """
+        cells = self.cells
+        for (cx, cy), bucket in cells.items():
+            count = len(bucket)
+            for i in range(count):
+                for j in range(i + 1, count):
+                    yield bucket[i], bucket[j]
+            for ox, oy in _FORWARD_NEIGHBOURS:
+                other = cells.get((cx + ox, cy + oy))
+                if other:
+                    for a in bucket:
+                        for b in other:
+                            yield a, b
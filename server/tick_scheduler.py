@@ -0,0 +1,110 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Optional
+
+
+class TickScheduler:
+    """Fixed-timestep scheduler driven by a monotonic clock and an accumulator"""
+
+    def __init__(self, tick_rate: float = 60, max_catchup_steps: int = 5):
+        self.tick_rate = tick_rate
+        self.tick_interval = 1 / tick_rate
+        self.max_catchup_steps = max_catchup_steps
+
+        # Counters so we can see when the loop can't keep up
+        self.ticks = 0  # Simulation steps executed
+        self.overruns = 0  # Loop iterations that found more than one step due
+        self.catchup_steps = 0  # Extra steps run to catch up after an overrun
+        self.dropped_ticks = 0  # Steps abandoned beyond max_catchup_steps
+        self.last_step_duration = 0.0  # Wall time of the most recent step
+        self.max_step_duration = 0.0
+
+        # Future the loop sleeps on between steps, so wake() can cut it short
+        self.waiter: Optional[asyncio.Future] = None
+        self.step_now = False
+
+    def set_tick_rate(self, tick_rate: float):
+        self.tick_rate = tick_rate
+        self.tick_interval = 1 / tick_rate
+
+    def wake(self):
+        """Run the next step now rather than after the current sleep"""
+        self.step_now = True
+        if self.waiter is not None and not self.waiter.done():
+            self.waiter.set_result(None)
+
+    async def run(
+        self,
+        step: Callable[[float], Awaitable[None]],
+        after_steps: Optional[Callable[[float], Awaitable[None]]] = None,
+    ):
+        """Call step(dt) tick_rate times per second until cancelled
+
+        after_steps(elapsed) runs once per wake-up with the simulated time just
+        stepped, so output stages don't repeat themselves during catch-up.
+        """
+        previous = time.monotonic()
+        accumulator = self.tick_interval  # Run the first step immediately
+
+        while True:
+            now = time.monotonic()
+            accumulator += now - previous
+            previous = now
+            if self.step_now:
+                # The time slept so far still counts, so the clock stays right
+                self.step_now = False
+                accumulator = max(accumulator, self.tick_interval)
+
+            steps = 0
+            while accumulator >= self.tick_interval and steps < self.max_catchup_steps:
+                step_start = time.monotonic()
+                await step(self.tick_interval)
+                self.last_step_duration = time.monotonic() - step_start
+                self.max_step_duration = max(
+                    self.max_step_duration, self.last_step_duration
+                )
+                accumulator -= self.tick_interval
+                steps += 1
+                self.ticks += 1
+
+            if steps and after_steps is not None:
+                await after_steps(steps * self.tick_interval)
+
+            if steps > 1:
+                self.overruns += 1
+                self.catchup_steps += steps - 1
+
+            # Too far behind: drop whole ticks instead of spiralling
+            if accumulator >= self.tick_interval:
+                dropped = int(accumulator // self.tick_interval)
+                self.dropped_ticks += dropped
+                accumulator -= dropped * self.tick_interval
+
+            await self._sleep(self.tick_interval - accumulator)
+
+    async def _sleep(self, delay: float):
+        loop = asyncio.get_running_loop()
+        waiter = self.waiter = loop.create_future()
+        handle = loop.call_later(delay, self._end_sleep, waiter)
+        try:
+            await waiter
+        finally:
+            handle.cancel()
+            if self.waiter is waiter:
+                self.waiter = None
+
+    @staticmethod
+    def _end_sleep(waiter: asyncio.Future):
+        if not waiter.done():
+            waiter.set_result(None)
+
+    def stats(self) -> dict:
+        return {
+            "tick_rate": self.tick_rate,
+            "ticks": self.ticks,
+            "overruns": self.overruns,
+            "catchup_steps": self.catchup_steps,
+            "dropped_ticks": self.dropped_ticks,
+            "last_step_ms": round(self.last_step_duration * 1000, 3),
+            "max_step_ms": round(self.max_step_duration * 1000, 3),
+        }
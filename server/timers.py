@@ -0,0 +1,39 @@
+import heapq
+import itertools
+from typing import Dict, Hashable, List, Tuple
+
+
+class TimerHeap:
+    """One-shot timers on the simulation clock, kept in a binary heap
+
+    Each timer has a key (e.g. (player_id, "respawn")); scheduling a key again
+    replaces its due time. Replaced and cancelled timers stay in the heap and
+    are skipped when they come up, so both are O(log n) at most. Only timers
+    that are due cost anything per tick.
+    """
+
+    def __init__(self):
+        self.heap: List[Tuple[float, int, Hashable]] = []
+        self.due: Dict[Hashable, float] = {}  # Live timers: key -> due time
+        self.counter = itertools.count()  # Keeps equal due times in FIFO order
+
+    def __len__(self) -> int:
+        return len(self.due)
+
+    def schedule(self, key: Hashable, at: float):
+        self.due[key] = at
+        heapq.heappush(self.heap, (at, next(self.counter), key))
+
+    def cancel(self, key: Hashable):
+        self.due.pop(key, None)
+
+    def pop_due(self, now: float) -> List[Hashable]:
+        """Remove and return the keys of every live timer due at or before now"""
+        fired = []
+        heap = self.heap
+        while heap and heap[0][0] <= now:
+            at, _, key = heapq.heappop(heap)
+            if self.due.get(key) == at:
+                del self.due[key]
+                fired.append(key)
+        return fired
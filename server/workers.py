@@ -0,0 +1,465 @@
+"""Room simulation in worker processes, with WebSocket I/O in the front process
+
+Each worker process runs its own event loop and RoomManager, so rooms in
+different workers tick on different cores. The front process only accepts
+sockets and moves frames over one duplex pipe per worker:
+
+    front -> worker  ("join", conn_id, message) / ("message", conn_id, text)
+                     ("leave", conn_id, None) / ("stats", request_id, None)
+    worker -> front  a list of ("send", conn_id, frame) / ("close", conn_id, None)
+                     / ("events", conn_id, events_json) / ("snapshot", conn_id, frame)
+                     / ("stats", request_id, stats), flushed once per loop pass
+
+Snapshots travel apart from the JSON array of events that goes with them, so
+the front can still coalesce them for a slow client without losing events. A
+snapshot shared by many clients is the same object in the batch, so pickle's
+memo writes it to the pipe only once. Both ends go through a PipeChannel, so
+neither process ever blocks on the pipe.
+"""
+import asyncio
+import itertools
+import multiprocessing
+import os
+import pickle
+import struct
+import time
+import zlib
+from functools import partial
+from typing import Callable, Dict, Hashable, List, Optional
+
+from codec import codec
+from connection import ClientConnection
+from game_state import GameManager
+from rooms import RoomFullError, RoomManager
+
+FRAME_LENGTH = struct.Struct("<I")
+
+
+class PipeChannel:
+    """Length-prefixed pickle frames over one end of a Pipe, without blocking
+
+    Outgoing frames are buffered and written whenever the fd is writable, and
+    incoming bytes are split into frames as they arrive. A peer that stops
+    reading only grows this side's buffer; it can't stall this event loop, so
+    two busy processes can't deadlock sending to each other.
+    """
+
+    def __init__(
+        self,
+        connection,
+        on_message: Callable[[object], None],
+        on_closed: Callable[[], None],
+    ):
+        self.connection = connection
+        self.fd = connection.fileno()
+        os.set_blocking(self.fd, False)
+        self.loop = asyncio.get_running_loop()
+        self.on_message = on_message
+        self.on_closed = on_closed
+        self.inbox = bytearray()
+        self.outbox = bytearray()
+        self.writing = False
+        self.closed = False
+        self.loop.add_reader(self.fd, self._on_readable)
+
+    def send(self, message):
+        if self.closed:
+            raise BrokenPipeError("pipe closed")
+        data = pickle.dumps(message, pickle.HIGHEST_PROTOCOL)
+        self.outbox += FRAME_LENGTH.pack(len(data))
+        self.outbox += data
+        if not self.writing:
+            self._flush()
+
+    def _flush(self):
+        try:
+            while self.outbox:
+                sent = os.write(self.fd, self.outbox)
+                del self.outbox[:sent]
+        except BlockingIOError:
+            pass
+        except OSError:
+            self._lost()
+            return
+        if self.outbox and not self.writing:
+            self.loop.add_writer(self.fd, self._flush)
+            self.writing = True
+        elif not self.outbox and self.writing:
+            self.loop.remove_writer(self.fd)
+            self.writing = False
+
+    def _on_readable(self):
+        try:
+            data = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self._lost()
+            return
+        inbox = self.inbox
+        inbox += data
+        offset = 0
+        messages = []
+        while len(inbox) - offset >= FRAME_LENGTH.size:
+            (size,) = FRAME_LENGTH.unpack_from(inbox, offset)
+            end = offset + FRAME_LENGTH.size + size
+            if len(inbox) < end:
+                break
+            messages.append(pickle.loads(inbox[offset + FRAME_LENGTH.size : end]))
+            offset = end
+        # Consumed before any callback runs, so a failing one can't replay them
+        del inbox[:offset]
+        for message in messages:
+            try:
+                self.on_message(message)
+            except Exception as e:
+                print(f"Error handling pipe message: {e}")
+            if self.closed:
+                return
+
+    def _lost(self):
+        """The other process went away"""
+        if not self.closed:
+            self.close()
+            self.on_closed()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.loop.remove_reader(self.fd)
+        if self.writing:
+            self.loop.remove_writer(self.fd)
+        self.connection.close()
+
+
+class PipeSocket:
+    """Stands in for a client WebSocket inside a worker process"""
+
+    def __init__(self, worker: "RoomWorker", conn_id: Hashable):
+        self.worker = worker
+        self.conn_id = conn_id
+
+    async def send_text(self, text: str):
+        self.worker.post(("send", self.conn_id, text))
+
+    async def send_bytes(self, data: bytes):
+        self.worker.post(("send", self.conn_id, data))
+
+    async def send_snapshot(self, frame, events_json: Optional[str]):
+        if events_json is not None:
+            self.worker.post(("events", self.conn_id, events_json))
+        self.worker.post(("snapshot", self.conn_id, frame))
+
+    async def close(self):
+        self.worker.post(("close", self.conn_id, None))
+
+
+class RoomWorker:
+    """Hosts rooms for clients whose sockets live in another process
+
+    Frames for those clients are collected and handed to send_batch once per
+    loop pass; the caller decides how they travel (a pipe, a cluster bus).
+    """
+
+    def __init__(self, rooms: RoomManager, send_batch: Callable[[List], None]):
+        self.rooms = rooms
+        self.send_batch = send_batch
+        self.sessions: Dict[Hashable, tuple] = {}  # conn_id -> (room, player)
+        # Messages that arrived while the join was still being processed
+        self.early_messages: Dict[Hashable, List[str]] = {}
+        self.outbox: List[tuple] = []
+
+    def dispatch(self, kind: str, conn_id: Hashable, payload):
+        if kind == "message":
+            session = self.sessions.get(conn_id)
+            if session is not None:
+                room, player = session
+                self.handle_message(conn_id, room, player, payload)
+            elif conn_id in self.early_messages:
+                self.early_messages[conn_id].append(payload)
+        elif kind == "join":
+            self.early_messages[conn_id] = []
+            asyncio.create_task(self.join(conn_id, payload))
+        elif kind == "leave":
+            asyncio.create_task(self.leave(conn_id))
+        elif kind == "stats":
+            self.post(("stats", conn_id, self.rooms.stats()))
+
+    async def join(self, conn_id: Hashable, message: Dict):
+        try:
+            _, room, player = await self.rooms.join(PipeSocket(self, conn_id), message)
+        except RoomFullError:
+            self.early_messages.pop(conn_id, None)
+            return
+        early_messages = self.early_messages.pop(conn_id, None)
+        if early_messages is None:
+            # Left while joining
+            await room.remove_player(player.id)
+            return
+        self.sessions[conn_id] = (room, player)
+        for text in early_messages:
+            if not self.handle_message(conn_id, room, player, text):
+                break
+
+    def handle_message(self, conn_id: Hashable, room, player, text: str) -> bool:
+        """Apply one client message; a malformed one closes only that socket"""
+        try:
+            room.handle_client_message(player.id, codec.decode(text))
+        except Exception as e:
+            print(f"Error handling message from {player.name} ({player.id}): {e}")
+            # The front closes the socket and sends "leave", which removes
+            # the player, as a failed receive loop does in one process
+            self.post(("close", conn_id, None))
+            return False
+        return True
+
+    async def leave(self, conn_id: Hashable):
+        self.early_messages.pop(conn_id, None)
+        session = self.sessions.pop(conn_id, None)
+        if session is not None:
+            room, player = session
+            print(f"Player {player.name} ({player.id}) disconnected")
+            await room.remove_player(player.id)
+
+    def post(self, item: tuple):
+        """Queue a frame for the front; all frames of one loop pass go together"""
+        if not self.outbox:
+            asyncio.get_running_loop().call_soon(self.flush)
+        self.outbox.append(item)
+
+    def flush(self):
+        outbox, self.outbox = self.outbox, []
+        self.send_batch(outbox)
+
+
+def run_worker(pipe, game_options: Dict, room_options: Dict):
+    """Worker process entry point"""
+    asyncio.run(serve_pipe(pipe, game_options, room_options))
+
+
+async def serve_pipe(pipe, game_options: Dict, room_options: Dict):
+    """Run a RoomWorker fed by the front process until the pipe closes"""
+    loop = asyncio.get_running_loop()
+    stopped = loop.create_future()
+
+    def send_batch(batch: List):
+        try:
+            channel.send(batch)
+        except (BrokenPipeError, OSError):
+            pass
+
+    def on_closed():
+        # Front process went away
+        if not stopped.done():
+            stopped.set_result(None)
+
+    rooms = RoomManager(partial(GameManager, **game_options), **room_options)
+    worker = RoomWorker(rooms, send_batch)
+    channel = PipeChannel(pipe, lambda message: worker.dispatch(*message), on_closed)
+    await stopped
+
+
+class SocketRelay:
+    """Front side of sockets whose rooms are hosted somewhere else
+
+    Each socket keeps a ClientConnection here too, so a slow client only
+    backs up its own queue and never the link to the process hosting it.
+    """
+
+    def __init__(self):
+        self.connections: Dict[Hashable, ClientConnection] = {}
+        self.monitor_task = None
+
+    def deliver(self, kind: str, conn_id: Hashable, payload) -> bool:
+        """Apply a frame from the room host; False if it isn't a socket frame"""
+        if kind == "send":
+            connection = self.connections.get(conn_id)
+            if connection is not None:
+                connection.send(payload)
+        elif kind == "events":
+            connection = self.connections.get(conn_id)
+            if connection is not None:
+                connection.queue_events(payload)
+        elif kind == "snapshot":
+            connection = self.connections.get(conn_id)
+            if connection is not None:
+                connection.send_snapshot(payload)
+        elif kind == "close":
+            connection = self.connections.get(conn_id)
+            if connection is not None:
+                asyncio.create_task(self.close_socket(connection, flush=True))
+        else:
+            return False
+        return True
+
+    async def close_socket(self, connection: ClientConnection, flush: bool = False):
+        if flush:
+            # Let frames sent just before the close (e.g. an error) go out first
+            for _ in range(100):
+                if connection.closed or not connection.frames_in_flight:
+                    break
+                await asyncio.sleep(0.01)
+        connection.close()
+
+    async def monitor_connections(self):
+        """Close sockets whose front-side queue overflowed or stalled"""
+        while True:
+            await asyncio.sleep(0.5)
+            now = time.monotonic()
+            for connection in list(self.connections.values()):
+                if connection.closed or connection.is_stalled(now):
+                    await self.close_socket(connection)
+
+    async def relay(
+        self,
+        conn_id: Hashable,
+        websocket,
+        join_message: Dict,
+        send: Callable[[tuple], None],
+    ):
+        """Forward a socket's frames to its room host until it disconnects"""
+        self.connections[conn_id] = ClientConnection(str(conn_id), websocket)
+        try:
+            send(("join", conn_id, join_message))
+            while True:
+                text = await websocket.receive_text()
+                send(("message", conn_id, text))
+        except Exception:
+            # WebSocketDisconnect, or the socket closed by close_socket
+            pass
+        finally:
+            self.connections.pop(conn_id).close()
+            try:
+                send(("leave", conn_id, None))
+            except (BrokenPipeError, OSError):
+                pass
+
+
+class WorkerPool(SocketRelay):
+    """Front process side: owns the sockets and routes them to worker processes
+
+    Named rooms always map to the same worker; matchmaking joins go to the
+    worker with the fewest connections, which then picks a room itself. A
+    worker that exited gets no new joins; its named rooms move to a live one.
+    """
+
+    def __init__(self, workers: int, game_options: Dict, room_options: Dict):
+        super().__init__()
+        self.workers = workers
+        self.game_options = game_options
+        self.room_options = room_options
+        self.processes: List[multiprocessing.Process] = []
+        self.channels: List[PipeChannel] = []
+        self.load: List[int] = [0] * workers
+        self.alive: List[bool] = [True] * workers
+        self.routes: Dict[int, int] = {}  # conn_id -> worker index
+        self.conn_ids = itertools.count(1)
+        self.stats_requests = itertools.count(1)
+        self.pending_stats: Dict[int, asyncio.Future] = {}
+
+    def start(self):
+        # Spawn rather than fork: the front already runs an event loop
+        context = multiprocessing.get_context("spawn")
+        for index in range(self.workers):
+            front_end, worker_end = context.Pipe()
+            process = context.Process(
+                target=run_worker,
+                args=(worker_end, self.game_options, self.room_options),
+                daemon=True,
+            )
+            process.start()
+            worker_end.close()
+            self.processes.append(process)
+            self.channels.append(
+                PipeChannel(
+                    front_end,
+                    partial(self.on_batch, index),
+                    partial(self.on_worker_exit, index),
+                )
+            )
+        self.monitor_task = asyncio.create_task(self.monitor_connections())
+
+    def stop(self):
+        for channel in self.channels:
+            channel.close()
+        for process in self.processes:
+            process.join(timeout=1.0)
+            if process.is_alive():
+                process.terminate()
+        if self.monitor_task is not None:
+            self.monitor_task.cancel()
+
+    def pick_worker(self, room_id: Optional[str]) -> Optional[int]:
+        """Index of a live worker for the join; None if every worker exited"""
+        live = [index for index in range(self.workers) if self.alive[index]]
+        if not live:
+            return None
+        if room_id:
+            slot = zlib.crc32(room_id.encode())
+            if self.alive[slot % self.workers]:
+                return slot % self.workers
+            return live[slot % len(live)]
+        return min(live, key=self.load.__getitem__)
+
+    def on_batch(self, index: int, batch: List[tuple]):
+        for kind, key, payload in batch:
+            if self.deliver(kind, key, payload):
+                continue
+            if kind == "stats":
+                future = self.pending_stats.pop(key, None)
+                if future is not None and not future.done():
+                    future.set_result(payload)
+
+    def on_worker_exit(self, index: int):
+        print(f"Worker {index} exited")
+        self.alive[index] = False
+        for conn_id, worker in list(self.routes.items()):
+            if worker == index and conn_id in self.connections:
+                asyncio.create_task(self.close_socket(self.connections[conn_id]))
+
+    async def serve(self, websocket):
+        """Relay one accepted socket to its worker until it disconnects"""
+        try:
+            message = codec.decode(await websocket.receive_text())
+        except Exception:
+            return
+        if not isinstance(message, dict) or message.get("type") != "join":
+            return
+
+        worker = self.pick_worker(message.get("room_id"))
+        if worker is None:
+            return
+        conn_id = next(self.conn_ids)
+        self.load[worker] += 1
+        self.routes[conn_id] = worker
+        try:
+            await self.relay(conn_id, websocket, message, self.channels[worker].send)
+        finally:
+            self.load[worker] -= 1
+            self.routes.pop(conn_id, None)
+
+    async def stats(self, timeout: float = 1.0) -> List[Optional[Dict]]:
+        """Room stats from every worker; None for a worker that didn't answer"""
+        loop = asyncio.get_running_loop()
+        futures = []
+        for channel in self.channels:
+            request_id = next(self.stats_requests)
+            future = loop.create_future()
+            self.pending_stats[request_id] = future
+            futures.append((request_id, future))
+            try:
+                channel.send(("stats", request_id, None))
+            except (BrokenPipeError, OSError):
+                future.set_result(None)
+
+        results = []
+        for request_id, future in futures:
+            try:
+                results.append(await asyncio.wait_for(future, timeout))
+            except asyncio.TimeoutError:
+                self.pending_stats.pop(request_id, None)
+                results.append(None)
+        return results
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""Server binary snapshot encoder against the client decoder"""
+import os
+import sys
+import time
+
+# Add client and server directories to path
+sys.path.append(os.path.join(os.path.dirname(__file__), "client"))
+sys.path.append(os.path.join(os.path.dirname(__file__), "server"))
+
+from binary_decoder import decode_snapshot
+from binary_protocol import encode_snapshot
+from codec import codec
+from connection import attach_events
+from entities import PlayerEntity
+
+from test_helpers import check, report
+
+
+def close(a, b, step):
+    """Equal within the quantisation step of a field"""
+    return abs(a - b) <= step / 2 + 1e-9
+
+
+def test_binary_protocol():
+    print("=== Binary Protocol Test ===")
+    results = []
+    now = time.time()
+    alive = PlayerEntity(
+        id="a",
+        name="Alive",
+        x=123.456,
+        y=78.9,
+        color=(255, 0, 0),
+        velocity_x=-1.234,
+        velocity_y=0.5,
+        stamina=42.3,
+        collision_effect_time=0.25,
+        boost_effect_time=0.5,
+        entity_id=7,
+        last_input_seq=70000,
+    )
+    dead = PlayerEntity(
+        id="d",
+        name="Dead",
+        x=5000.0,  # Beyond the 16-bit position range
+        y=-10.0,
+        color=(0, 0, 255),
+        deaths=3,
+        stamina=0.0,
+        is_dead=True,
+        respawn_cooldown=now + 1.5,
+        respawn_ready=False,
+        entity_id=8,
+    )
+
+    tick, entities, events = decode_snapshot(
+        encode_snapshot(2**32 + 5, [alive, dead], now)
+    )
+    results.append(check("tick wraps to 32 bits", tick == 5))
+    results.append(check("entities by id", sorted(entities) == [7, 8]))
+    results.append(check("no trailer, no events", events == []))
+
+    decoded = entities[7]
+    results.append(
+        check(
+            "position and velocity",
+            close(decoded["x"], alive.x, 1 / 8)
+            and close(decoded["y"], alive.y, 1 / 8)
+            and close(decoded["velocity_x"], alive.velocity_x, 1 / 256)
+            and close(decoded["velocity_y"], alive.velocity_y, 1 / 256),
+        )
+    )
+    results.append(check("stamina", close(decoded["stamina"], alive.stamina, 1 / 2)))
+    results.append(
+        check(
+            "effect times",
+            close(decoded["collision_effect_time"], 0.25, 1 / 100)
+            and close(decoded["boost_effect_time"], 0.5, 1 / 100),
+        )
+    )
+    results.append(
+        check(
+            "flags",
+            not decoded["is_dead"]
+            and decoded["respawn_ready"]
+            and entities[8]["is_dead"]
+            and not entities[8]["respawn_ready"],
+        )
+    )
+    results.append(check("input seq low 16 bits", decoded["last_input_seq"] == 4464))
+
+    decoded = entities[8]
+    results.append(check("position clamped", decoded["x"] == 32767 / 8))
+    results.append(check("deaths", decoded["deaths"] == 3))
+    results.append(
+        check(
+            "respawn cooldown",
+            abs(decoded["respawn_cooldown"] - dead.respawn_cooldown) < 0.1,
+        )
+    )
+
+    # Events go after the entities as a JSON array, as ClientConnection
+    # attaches them when the snapshot is written
+    sent_events = [
+        {"type": "player_joined", "data": {"id": "a", "name": "Alive"}},
+        {"type": "player_death", "data": {"player_id": "d"}},
+    ]
+    frame = attach_events(encode_snapshot(6, [alive], now), codec.encode(sent_events))
+    tick, entities, events = decode_snapshot(frame)
+    results.append(check("trailer events", events == sent_events))
+    results.append(
+        check("entities before trailer", tick == 6 and list(entities) == [7])
+    )
+
+    empty = decode_snapshot(encode_snapshot(7, [], now))
+    results.append(check("empty snapshot", empty == (7, {}, [])))
+
+    try:
+        decode_snapshot(b"\x09" + encode_snapshot(8, [], now)[1:])
+        results.append(check("unknown frame type rejected", False))
+    except ValueError:
+        results.append(check("unknown frame type rejected", True))
+
+    report("Binary protocol", results)
+
+
+if __name__ == "__main__":
+    test_binary_protocol()
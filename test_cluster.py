@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""Two cluster nodes on an InMemoryBus: a join on node a for a room owned by b"""
+import asyncio
+import json
+import os
+import sys
+
+# Add server directory to path
+sys.path.append(os.path.join(os.path.dirname(__file__), "server"))
+
+from cluster import ClusterNode, InMemoryBus, MessageBus, RoomRegistry
+from game_state import GameManager
+from rooms import RoomManager
+
+from test_helpers import MockWebSocket, check, report
+
+
+async def test_cluster():
+    print("=== Cluster Relay Test ===")
+    results = []
+    try:
+        MessageBus()
+        results.append(check("MessageBus is abstract", False))
+    except TypeError:
+        results.append(check("MessageBus is abstract", True))
+
+    bus = InMemoryBus()
+    nodes = {
+        node_id: ClusterNode(
+            node_id,
+            ["a", "b"],
+            bus,
+            RoomRegistry(),
+            RoomManager(GameManager, room_capacity=4),
+            load_interval=0.1,
+        )
+        for node_id in ("a", "b")
+    }
+    for node in nodes.values():
+        await node.start()
+    front, host = nodes["a"], nodes["b"]
+
+    # Both nodes agree on the owner without asking each other
+    room_id = next(f"room{i}" for i in range(100) if front.owner_of(f"room{i}") == "b")
+    results.append(check("owner agreed", host.owner_of(room_id) == "b"))
+
+    websocket = MockWebSocket()
+    join = {"type": "join", "name": "Relayed", "room_id": room_id, "protocol": "json"}
+    relay_task = asyncio.create_task(front.forward(websocket, join, "b"))
+    await asyncio.sleep(0.3)
+
+    room = host.rooms.rooms.get(room_id)
+    results.append(check("room hosted on b", room is not None))
+    results.append(check("no room on a", not front.rooms.rooms))
+    player = next(iter(room.players.values())) if room else None
+    results.append(check("player joined b", player and player.name == "Relayed"))
+
+    states = [m for m in websocket.messages() if m.get("type") == "game_state"]
+    joined = [s for s in states if "your_player_id" in s["data"]]
+    results.append(
+        check(
+            "frames relayed back to a",
+            bool(joined)
+            and player is not None
+            and joined[0]["data"]["your_player_id"] == player.id
+            and len(states) > 1,
+        )
+    )
+
+    # Input goes a -> b and is applied to the player hosted there
+    websocket.inbox.put_nowait(
+        json.dumps({"type": "input_state", "seq": 1, "directions": 8, "boost": False})
+    )
+    await asyncio.sleep(0.2)
+    results.append(
+        check(
+            "input relayed to b",
+            player is not None and player.last_input_seq == 1 and player.velocity_x > 0,
+        )
+    )
+
+    load = front.registry.loads.get("b", {})
+    results.append(check("load reported to a", load.get("players") == 1))
+
+    # Disconnecting on a removes the player on b
+    websocket.inbox.put_nowait(None)
+    await relay_task
+    await asyncio.sleep(0.2)
+    results.append(check("leave relayed to b", room is not None and not room.players))
+
+    for node in nodes.values():
+        await node.stop()
+    await host.rooms.close_room(room_id)
+    report("Cluster", results)
+
+
+if __name__ == "__main__":
+    asyncio.run(test_cluster())
@@ -0,0 +1,59 @@
+"""Shared pieces of the test scripts: a fake client socket and result reporting"""
+import asyncio
+import json
+import sys
+
+
+class MockWebSocket:
+    """Server side of a client socket: collects what the server sends
+
+    Texts put in `inbox` are what the client sends; None disconnects it, as
+    does closing the socket from the server side.
+    """
+
+    def __init__(self):
+        self.inbox = asyncio.Queue()
+        self.sent = []
+        self.closed = False
+
+    async def receive_text(self):
+        text = await self.inbox.get()
+        if text is None:
+            raise ConnectionError("disconnected")
+        return text
+
+    async def send_text(self, text):
+        self.sent.append(text)
+
+    async def send_bytes(self, data):
+        self.sent.append(data)
+
+    async def close(self):
+        self.closed = True
+        self.inbox.put_nowait(None)
+
+    def messages(self):
+        """Every JSON message received so far, with batches flattened"""
+        messages = []
+        for frame in self.sent:
+            if isinstance(frame, str):
+                message = json.loads(frame)
+                if message.get("type") == "batch":
+                    messages.extend(message["data"])
+                else:
+                    messages.append(message)
+        return messages
+
+
+def check(name, ok):
+    print(f"{'✅' if ok else '❌'} {name}")
+    return ok
+
+
+def report(name, results):
+    """Print the verdict; exit non-zero if any check failed"""
+    if all(results):
+        print(f"✅ {name} test PASSED!")
+    else:
+        print(f"❌ {name} test FAILED!")
+        sys.exit(1)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""Per-tick input cap, drop counter and disconnect of a flooding client"""
+import asyncio
+import itertools
+import os
+import sys
+
+# Add server directory to path
+sys.path.append(os.path.join(os.path.dirname(__file__), "server"))
+
+from game_state import GameManager
+
+from test_helpers import MockWebSocket, check, report
+
+MAX_INPUTS = 4
+MAX_STRIKES = 5
+
+
+async def run_tick(gm):
+    """One simulation step plus its end-of-tick stages, as the loop runs them"""
+    dt = 1 / gm.simulation_rate
+    await gm.update_physics(dt)
+    await gm.end_of_tick(dt)
+
+
+def send_inputs(gm, player, seqs, count):
+    for _ in range(count):
+        gm.handle_client_message(
+            player.id,
+            {"type": "input_state", "seq": next(seqs), "directions": 8, "boost": False},
+        )
+
+
+def send_actions(gm, player, count):
+    for _ in range(count):
+        gm.handle_client_message(
+            player.id, {"type": "input", "action": "move", "direction": "up"}
+        )
+
+
+async def test_input_flood():
+    print("=== Input Flood Test ===")
+    results = []
+    # idle_step_ticks=1: no hibernation, so the per-tick cap stays MAX_INPUTS
+    gm = GameManager(
+        max_inputs_per_tick=MAX_INPUTS,
+        max_flood_strikes=MAX_STRIKES,
+        idle_step_ticks=1,
+    )
+    flooder_ws, polite_ws, burst_ws = MockWebSocket(), MockWebSocket(), MockWebSocket()
+    flooder = await gm.add_player(flooder_ws, "Flooder")
+    polite = await gm.add_player(polite_ws, "Polite")
+    burst = await gm.add_player(burst_ws, "Burst")
+    # Ticks are driven by hand below
+    gm.stop_loop()
+    flooder_conn = gm.connected_clients[flooder.id]
+    polite_conn = gm.connected_clients[polite.id]
+    burst_conn = gm.connected_clients[burst.id]
+    seqs = {player.id: itertools.count(1) for player in (flooder, polite, burst)}
+
+    # First tick: held-key states coalesce to the newest one, discrete
+    # actions are capped; both count what they dropped
+    send_inputs(gm, flooder, seqs[flooder.id], MAX_INPUTS * 3)
+    send_inputs(gm, polite, seqs[polite.id], MAX_INPUTS)
+    send_actions(gm, burst, MAX_INPUTS * 3)
+    results.append(check("actions capped", len(burst_conn.inputs) == MAX_INPUTS))
+    results.append(
+        check("dropped actions counted", burst_conn.inputs_dropped == MAX_INPUTS * 2)
+    )
+    await run_tick(gm)
+    results.append(check("newest state wins", flooder.last_input_seq == MAX_INPUTS * 3))
+    results.append(
+        check(
+            "replaced states counted",
+            flooder_conn.inputs_dropped == MAX_INPUTS * 3 - 1,
+        )
+    )
+    results.append(check("one strike", flooder_conn.flood_strikes == 1))
+    results.append(check("burst strike", burst_conn.flood_strikes == 1))
+    results.append(check("no strike within limit", polite_conn.flood_strikes == 0))
+
+    # Keep flooding until one tick short of the limit: still connected
+    for _ in range(MAX_STRIKES - 2):
+        send_inputs(gm, flooder, seqs[flooder.id], MAX_INPUTS * 3)
+        send_inputs(gm, polite, seqs[polite.id], MAX_INPUTS)
+        send_inputs(gm, burst, seqs[burst.id], 1)
+        await run_tick(gm)
+    results.append(check("kept below the limit", flooder.id in gm.players))
+
+    # The MAX_STRIKES-th flooded tick disconnects and removes the player
+    send_inputs(gm, flooder, seqs[flooder.id], MAX_INPUTS * 3)
+    send_inputs(gm, polite, seqs[polite.id], MAX_INPUTS)
+    await run_tick(gm)
+    results.append(check("flooder removed", flooder.id not in gm.players))
+    # Let the scheduled socket close run
+    await asyncio.sleep(0)
+    results.append(check("flooder socket closed", flooder_ws.closed))
+
+    # A well-behaved client stays; a short burst is forgiven over time
+    results.append(check("polite player kept", polite.id in gm.players))
+    results.append(check("polite strikes", polite_conn.flood_strikes == 0))
+    results.append(
+        check(
+            "burst forgiven",
+            burst.id in gm.players
+            and burst_conn.flood_strikes == 0
+            and not burst_conn.closed,
+        )
+    )
+    results.append(
+        check("others' sockets open", not polite_ws.closed and not burst_ws.closed)
+    )
+
+    await gm.stop()
+    report("Input flood", results)
+
+
+if __name__ == "__main__":
+    asyncio.run(test_input_flood())
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""GameClient's rebuilt state vs the server's: keyframes, deltas, removed, resync"""
+import asyncio
+import os
+import sys
+
+# Add client and server directories to path
+sys.path.append(os.path.join(os.path.dirname(__file__), "client"))
+sys.path.append(os.path.join(os.path.dirname(__file__), "server"))
+
+from codec import codec
+from entities import PLAYER_FIELDS
+from game_client import GameClient
+from game_state import GameManager
+
+from test_helpers import MockWebSocket, check, report
+
+KEYFRAME_TICKS = 10
+
+
+class ClientSocket:
+    """Client side: acks and resync requests go straight to the room"""
+
+    def __init__(self, gm, player_id):
+        self.gm = gm
+        self.player_id = player_id
+
+    async def send(self, text):
+        self.gm.handle_client_message(self.player_id, codec.decode(text))
+
+
+class SyncedClient:
+    """A GameClient fed the frames the server wrote to one socket"""
+
+    def __init__(self, gm, player, websocket):
+        self.websocket = websocket
+        self.client = GameClient("json")
+        self.client.websocket = ClientSocket(gm, player.id)
+        self.client.connected = True
+        self.snapshots = []  # game_state data of every frame received
+
+    async def receive(self):
+        # Let the connection's writer task flush its outbox
+        await asyncio.sleep(0.01)
+        frames, self.websocket.sent = self.websocket.sent, []
+        for frame in frames:
+            message = codec.decode(frame)
+            items = message["data"] if message["type"] == "batch" else [message]
+            for item in items:
+                if item["type"] == "game_state":
+                    self.snapshots.append(item["data"])
+                await self.client._handle_message(item)
+
+    @property
+    def last(self):
+        return self.snapshots[-1]
+
+    def players(self):
+        return self.client.game_state.get("players", {})
+
+
+def matches_server(gm, synced):
+    """Every snapshot field of every player equals the server's last snapshot"""
+    server_players, _ = gm.snapshot_history[gm.tick]
+    client_players = synced.players()
+    if client_players.keys() != server_players.keys():
+        return False
+    for pid, entry in server_players.items():
+        # Through JSON, as the client sees them (tuples become lists)
+        expected = codec.decode(codec.encode(dict(zip(PLAYER_FIELDS, entry))))
+        client_player = client_players[pid]
+        if {field: client_player.get(field) for field in expected} != expected:
+            return False
+    return True
+
+
+async def broadcast(gm, synced_clients):
+    gm.tick += 1
+    await gm.broadcast_all_players_update()
+    for synced in synced_clients:
+        await synced.receive()
+
+
+def move(gm):
+    for i, player in enumerate(gm.players.values()):
+        player.x += 1.5 + i
+        player.velocity_y = 0.25 * (i + 1)
+
+
+async def test_snapshot_sync():
+    print("=== Snapshot Sync Test ===")
+    results = []
+    gm = GameManager(keyframe_interval=KEYFRAME_TICKS / 60)
+
+    async def join(name):
+        websocket = MockWebSocket()
+        player = await gm.add_player(websocket, name)
+        # Snapshots are driven by hand below
+        gm.stop_loop()
+        initial_state = await gm.get_game_state_for_player(player.id)
+        gm.send_to_player(player.id, codec.encode(initial_state))
+        synced = SyncedClient(gm, player, websocket)
+        await synced.receive()
+        return player, synced
+
+    player, synced = await join("Watcher")
+    other, _ = await join("Leaver")
+    await synced.receive()
+    results.append(check("join state", synced.client.player_id == player.id))
+
+    # No acknowledged baseline yet: a keyframe
+    await broadcast(gm, [synced])
+    results.append(check("first snapshot keyframe", synced.last.get("keyframe")))
+    results.append(check("keyframe matches", matches_server(gm, synced)))
+
+    # Acked, so later ones are deltas with only the changed fields
+    move(gm)
+    await broadcast(gm, [synced])
+    results.append(check("delta sent", "baseline" in synced.last))
+    results.append(check("delta matches", matches_server(gm, synced)))
+    results.append(
+        check("join-only fields dropped", "messages" not in synced.client.game_state)
+    )
+    await broadcast(gm, [synced])
+    results.append(check("empty delta", not synced.last.get("players")))
+    results.append(check("unchanged state matches", matches_server(gm, synced)))
+
+    # A player leaves: the delta lists it as removed
+    await gm.remove_player(other.id)
+    move(gm)
+    await broadcast(gm, [synced])
+    removed = synced.last.get("removed", [])
+    results.append(check("removed listed", other.id in removed))
+    results.append(check("removal matches", matches_server(gm, synced)))
+
+    # The client lost its baselines: it asks for a resync instead of
+    # applying the delta, and the server answers with a keyframe
+    connection = gm.connected_clients[player.id]
+    synced.client.snapshots.clear()
+    move(gm)
+    await broadcast(gm, [synced])
+    skipped = synced.client.game_state["tick"] < gm.tick
+    results.append(check("resync requested", skipped and connection.acked_tick is None))
+    move(gm)
+    await broadcast(gm, [synced])
+    results.append(check("resync keyframe", synced.last.get("keyframe")))
+    results.append(check("resync matches", matches_server(gm, synced)))
+
+    # Periodic keyframes arrive even while deltas are acknowledged
+    keyframe_ticks = []
+    for _ in range(KEYFRAME_TICKS + 1):
+        move(gm)
+        await broadcast(gm, [synced])
+        if synced.last.get("keyframe"):
+            keyframe_ticks.append(gm.tick)
+        if not matches_server(gm, synced):
+            break
+    results.append(check("periodic keyframe", len(keyframe_ticks) == 1))
+    results.append(check("state matches throughout", matches_server(gm, synced)))
+
+    await gm.stop()
+    report("Snapshot sync", results)
+
+
+if __name__ == "__main__":
+    asyncio.run(test_snapshot_sync())
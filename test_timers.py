@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""Respawn readiness and effect expiry driven by the TimerHeap on sim_time"""
+import asyncio
+import os
+import sys
+
+# Add server directory to path
+sys.path.append(os.path.join(os.path.dirname(__file__), "server"))
+
+from game_state import RESPAWN_TIMER, GameManager
+from models import PlayerInput
+from timers import TimerHeap
+
+from test_helpers import MockWebSocket, check, report
+
+
+async def step(gm):
+    """One simulation step at the scheduler's current rate"""
+    await gm.update_physics(1 / gm.scheduler.tick_rate)
+
+
+def test_timer_heap(results):
+    timers = TimerHeap()
+    timers.schedule("a", 1.0)
+    timers.schedule("b", 2.0)
+    timers.schedule("c", 1.0)
+    results.append(check("nothing due early", timers.pop_due(0.5) == []))
+    results.append(check("due in order", timers.pop_due(1.0) == ["a", "c"]))
+    results.append(check("fires once", timers.pop_due(1.5) == []))
+
+    # Rescheduling replaces the due time, earlier or later
+    timers.schedule("b", 3.0)
+    results.append(check("old due time skipped", timers.pop_due(2.5) == []))
+    results.append(check("new due time fires", timers.pop_due(3.0) == ["b"]))
+    timers.schedule("d", 5.0)
+    timers.schedule("d", 4.0)
+    results.append(check("moved earlier", timers.pop_due(4.0) == ["d"]))
+    results.append(check("not again at old time", timers.pop_due(5.0) == []))
+
+    timers.schedule("e", 6.0)
+    timers.cancel("e")
+    timers.cancel("missing")
+    results.append(check("cancelled", timers.pop_due(7.0) == [] and not timers))
+
+
+async def test_respawn_timer(results):
+    gm = GameManager()
+    player = await gm.add_player(MockWebSocket(), "TimerPlayer")
+    # Steps are driven by hand below
+    gm.stop_loop()
+
+    await gm.kill_player(player)
+    due = gm.sim_time + gm.respawn_cooldown_time
+    fired_at = None
+    while gm.sim_time < due + 1.0:
+        await step(gm)
+        if player.respawn_ready and fired_at is None:
+            fired_at = gm.sim_time
+    results.append(
+        check(
+            "respawn ready at sim_time",
+            fired_at is not None and due <= fired_at < due + 1 / gm.simulation_rate,
+        )
+    )
+    results.append(
+        check("respawn timer gone", (player.id, RESPAWN_TIMER) not in gm.timers.due)
+    )
+
+    # Killed again, then the room starts hibernating halfway through the
+    # cooldown: fewer, longer steps still reach the same sim_time
+    await gm.handle_player_input(PlayerInput(player_id=player.id, action="respawn"))
+    results.append(check("respawned", not player.is_dead))
+    await gm.kill_player(player)
+    due = gm.sim_time + gm.respawn_cooldown_time
+    while gm.sim_time < due - gm.respawn_cooldown_time / 2:
+        await step(gm)
+    gm.set_idle(True)
+    idle_dt = 1 / gm.scheduler.tick_rate
+    steps = 0
+    while not player.respawn_ready:
+        await step(gm)
+        steps += 1
+    results.append(
+        check(
+            "respawn across tick rate change",
+            due <= gm.sim_time < due + idle_dt
+            and steps <= gm.respawn_cooldown_time / 2 / idle_dt + 1,
+        )
+    )
+    gm.set_idle(False)
+    await gm.stop()
+
+
+async def test_effect_timers(results):
+    gm = GameManager()
+    player = await gm.add_player(MockWebSocket(), "EffectPlayer")
+    gm.stop_loop()
+    dt = 1 / gm.simulation_rate
+
+    gm.start_effect(player, "collision_effect_time", 0.3)
+    started = gm.sim_time
+    while gm.sim_time - started < 0.15 - dt / 2:
+        await step(gm)
+    gm.sync_effect_times()
+    results.append(
+        check("countdown synced", abs(player.collision_effect_time - 0.15) < 1e-6)
+    )
+
+    # Restarting the effect replaces its due time: the first one (0.15 s
+    # from now) must not clear it
+    gm.start_effect(player, "collision_effect_time", 0.3)
+    restarted = gm.sim_time
+    expired_early = False
+    while gm.sim_time - restarted < 0.3 - dt / 2:
+        expired_early = expired_early or player.collision_effect_time == 0.0
+        await step(gm)
+    results.append(check("restart replaces due time", not expired_early))
+    results.append(check("effect expired", player.collision_effect_time == 0.0))
+    results.append(check("effect timer gone", not gm.timers.due))
+
+    # Leaving cancels the player's timers
+    gm.start_effect(player, "boost_effect_time", 0.1)
+    await gm.kill_player(player)
+    await gm.remove_player(player.id)
+    results.append(check("cancelled on remove_player", not gm.timers.due))
+    await gm.stop()
+
+
+async def test_timers():
+    print("=== Timer Heap Test ===")
+    results = []
+    test_timer_heap(results)
+    await test_respawn_timer(results)
+    await test_effect_timers(results)
+    report("Timer", results)
+
+
+if __name__ == "__main__":
+    asyncio.run(test_timers())